@@ -1,17 +1,51 @@
 from django.contrib import admin
+from django.utils import timezone
+from iotlab.ingest_api.devices.models import Device
 from .models import Telemetry, AnomalyDetection, Notification
 
 
+class BoundedForeignKeyMixin:
+    """Keep FK dropdown querysets down to the columns their labels need."""
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'device':
+            # Device.__str__ includes the device type name
+            kwargs['queryset'] = Device.objects.select_related('device_type').only(
+                'id', 'name', 'device_type__name'
+            ).order_by('name')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class DeviceFilter(admin.SimpleListFilter):
+    """Sidebar device filter that loads only device ids and names."""
+    title = 'device'
+    parameter_name = 'device'
+
+    def lookups(self, request, model_admin):
+        return Device.objects.order_by('name').values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(device_id=self.value())
+        return queryset
 
 
 @admin.register(Telemetry)
-class TelemetryAdmin(admin.ModelAdmin):
+class TelemetryAdmin(BoundedForeignKeyMixin, admin.ModelAdmin):
     list_display = ('device', 'timestamp', 'id')
-    list_filter = ('device', 'timestamp')
+    list_filter = (DeviceFilter, 'timestamp')
     search_fields = ('device__name', 'device__id')
     readonly_fields = ('id', 'device', 'timestamp', 'data')
+    raw_id_fields = ('device',)
     date_hierarchy = 'timestamp'
+    # Device.__str__ includes the device type name
+    list_select_related = ('device', 'device__device_type')
+
+    def get_queryset(self, request):
+        # The changelist never shows the JSON payloads
+        return super().get_queryset(request).select_related(
+            *self.list_select_related
+        ).defer('data', 'device__metadata')
 
     def has_add_permission(self, request):
         return False
@@ -21,30 +55,53 @@ class TelemetryAdmin(admin.ModelAdmin):
 
 
 @admin.register(AnomalyDetection)
-class AnomalyDetectionAdmin(admin.ModelAdmin):
+class AnomalyDetectionAdmin(BoundedForeignKeyMixin, admin.ModelAdmin):
     list_display = ('device', 'severity', 'timestamp', 'acknowledged')
-    list_filter = ('device', 'severity', 'acknowledged', 'timestamp')
+    list_filter = (DeviceFilter, 'severity', 'acknowledged', 'timestamp')
     search_fields = ('device__name', 'description')
-    readonly_fields = ('telemetry', 'device', 'timestamp', 'anomaly_data')
+    readonly_fields = ('device', 'timestamp', 'data')
+    raw_id_fields = ('device',)
     date_hierarchy = 'timestamp'
-    actions = ['mark_acknowledged']
+    actions = ['mark_acknowledged', 'mark_resolved']
+    # Device.__str__ includes the device type name
+    list_select_related = ('device', 'device__device_type')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            *self.list_select_related
+        ).defer('data', 'device__metadata')
     
     def mark_acknowledged(self, request, queryset):
-        updated = queryset.update(acknowledged=True)
+        # One UPDATE for the whole selection; already-acknowledged rows are left alone
+        updated = queryset.filter(acknowledged=False).update(
+            acknowledged=True,
+            acknowledged_at=timezone.now()
+        )
         self.message_user(
             request, 
             f"{updated} anomalies marked as acknowledged."
         )
     mark_acknowledged.short_description = "Mark selected anomalies as acknowledged"
+    
+    def mark_resolved(self, request, queryset):
+        updated = AnomalyDetection.resolve_queryset(queryset)
+        self.message_user(
+            request, 
+            f"{updated} anomalies marked as resolved."
+        )
+    mark_resolved.short_description = "Mark selected anomalies as resolved"
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(BoundedForeignKeyMixin, admin.ModelAdmin):
     list_display = ('device', 'notification_type', 'status', 'created_at', 'sent_at')
     list_filter = ('notification_type', 'status', 'created_at')
     search_fields = ('device__name', 'recipient', 'subject')
     readonly_fields = ('anomaly', 'device', 'created_at', 'sent_at')
+    raw_id_fields = ('device', 'anomaly')
     date_hierarchy = 'created_at'
+    # Device.__str__ includes the device type name
+    list_select_related = ('device', 'device__device_type')
     fieldsets = (
         (None, {
             'fields': ('anomaly', 'device', 'notification_type', 'status')
@@ -56,4 +113,9 @@ class NotificationAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'sent_at'),
             'classes': ('collapse',)
         }),
-    ) 
\ No newline at end of file
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            *self.list_select_related
+        ).defer('message', 'device__metadata')
@@ -6,3 +6,6 @@ class DashboardConfig(AppConfig):
     name = 'iotlab.dashboard'
     verbose_name = 'IoTLab Dashboard'
 
+    def ready(self):
+        # Register the filter option cache invalidation receivers
+        from . import signals  # noqa: F401
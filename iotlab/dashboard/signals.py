@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from iotlab.ingest_api.devices.models import Device, DeviceType
+
+
+@receiver([post_save, post_delete], sender=Device)
+@receiver([post_save, post_delete], sender=DeviceType)
+def invalidate_filter_options(sender, update_fields=None, **kwargs):
+    """Drop the cached filter dropdown options after a device or device type changes."""
+    # Heartbeat saves only touch last_seen, which no filter option depends on
+    if update_fields and set(update_fields) <= {'last_seen'}:
+        return
+    cache.delete_many(['dashboard_device_types', 'dashboard_locations'])
@@ -11,6 +11,6 @@ urlpatterns = [
     path('anomalies/', views.anomaly_list, name='anomaly_list'),
 path('anomalies/<int:anomaly_id>/acknowledge/', views.acknowledge_anomaly, name='acknowledge_anomaly'),
     path('metrics/', views.metrics_dashboard, name='metrics'),
-    path('telemetry-stream/', views.telemetry_stream, name='telemetry_stream'),
+    path('live/', views.live_stream, name='live_stream'),
 ]
 
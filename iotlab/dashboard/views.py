@@ -1,14 +1,62 @@
-import json
-from datetime import timedelta
+import orjson
+from datetime import datetime, time, timedelta
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
-from django.db.models import Count, Avg, Max
+from django.db.models import Count, Avg, Max, F, Q
+from django.db.models.functions import TruncDate
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
 
+from iotlab.ingest_api.core.utils import bounded_int
 from iotlab.ingest_api.devices.models import Device, DeviceType
 from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
 
+# Rows per page on the device and anomaly lists
+PAGE_SIZE = 50
+
+# Upper bounds on the ?hours= of device_detail and ?days= of metrics_dashboard
+MAX_HOURS = 720
+MAX_DAYS = 90
+
+# Device type name -> telemetry fields charted on the device detail page
+DEVICE_TYPE_FIELDS = {
+    'Temperature Sensor': ('temperature', 'humidity', 'battery'),
+    'Vibration Sensor': ('velocity_rms', 'frequency', 'temperature'),
+    'Flow Meter': ('flow_rate', 'pressure', 'temperature'),
+}
+
+# Filter dropdown options change rarely, so they're cached for this many
+# seconds; signals.invalidate_filter_options drops them on device changes
+FILTER_OPTIONS_TTL = 60
+
+
+def device_type_options():
+    """Device type names for the filter dropdowns."""
+    return cache.get_or_set(
+        'dashboard_device_types',
+        lambda: list(DeviceType.objects.values('name')),
+        FILTER_OPTIONS_TTL
+    )
+
+
+def location_options():
+    """Distinct device locations for the device list's filter dropdown."""
+    return cache.get_or_set(
+        'dashboard_locations',
+        lambda: list(Device.objects.values_list('metadata__location', flat=True).distinct()),
+        FILTER_OPTIONS_TTL
+    )
+
+
+def paginate(request, queryset):
+    """Return the requested page of queryset and the other query parameters, for page links."""
+    page = Paginator(queryset, PAGE_SIZE).get_page(request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('page', None)
+    return page, params.urlencode()
+
 
 def device_list(request):
     """View for listing all devices with filtering options."""
@@ -18,7 +66,7 @@ def device_list(request):
     location = request.GET.get('location')
     
     # Build the queryset with filters
-    devices = Device.objects.select_related('device_type').all()
+    devices = Device.objects.all()
     
     if device_type:
         devices = devices.filter(device_type__name=device_type)
@@ -31,14 +79,24 @@ def device_list(request):
     # Order by last_seen
     devices = devices.order_by('-last_seen')
     
+    # Only the columns the template shows, as dicts rather than model instances
+    devices = devices.values(
+        'id', 'name', 'status', 'last_seen',
+        device_type_name=F('device_type__name'),
+        location=F('metadata__location')
+    )
+    
     # Get unique filter options for the UI
-    device_types = DeviceType.objects.all()
+    device_types = device_type_options()
     status_choices = [choice[0] for choice in Device.STATUS_CHOICES]
     # Get unique locations from metadata
-    locations = Device.objects.values_list('metadata__location', flat=True).distinct()
+    locations = location_options()
+    
+    devices, page_query = paginate(request, devices)
     
     context = {
         'devices': devices,
+        'page_query': page_query,
         'device_types': device_types,
         'status_choices': status_choices,
         'locations': locations,
@@ -52,34 +110,6 @@ def device_list(request):
     return render(request, 'dashboard/device_list.html', context)
 
 
-def telemetry_stream(request):
-    """
-    Server-Sent Events endpoint for streaming telemetry updates to the dashboard.
-    Used with EventSource in the browser.
-    """
-    def event_stream():
-        """Generator for SSE events."""
-        yield "data: connected\n\n"
-        
-        # This implementation uses Server-Sent Events (SSE) to stream real-time updates.
-        # In a production environment, this would be integrated with:
-        # 1. Django Channels for WebSocket support
-        # 2. Redis as a message broker
-        # 3. MQTT client for IoT device communication
-        # For now, we're sending a heartbeat every 30 seconds to maintain the connection.
-        while True:
-            # Wait for 30 seconds
-            yield "event: heartbeat\ndata: {}\n\n"
-            
-    response = StreamingHttpResponse(
-        event_stream(),
-        content_type='text/event-stream'
-    )
-    response['Cache-Control'] = 'no-cache'
-    response['X-Accel-Buffering'] = 'no'  # Disable Nginx buffering
-    return response
-
-
 def index(request):
     """Main dashboard view showing high-level system metrics."""
     # Count active devices by type
@@ -89,24 +119,23 @@ def index(request):
     
     # Get recent anomaly counts
     recent_time = timezone.now() - timedelta(hours=24)
-    anomaly_count = AnomalyDetection.objects.filter(
+    anomaly_counts = AnomalyDetection.objects.filter(
         timestamp__gte=recent_time
-    ).count()
-    critical_anomalies = AnomalyDetection.objects.filter(
-        timestamp__gte=recent_time,
-        severity='critical'
-    ).count()
+    ).aggregate(
+        total=Count('id'),
+        critical=Count('id', filter=Q(severity='critical'))
+    )
+    anomaly_count = anomaly_counts['total']
+    critical_anomalies = anomaly_counts['critical']
     
     # Calculate device status counts
-    devices_total = Device.objects.count()
-    status_counts = Device.objects.values('status').annotate(
+    status_counts = list(Device.objects.values('status').annotate(
         count=Count('id')
-    ).order_by('status')
+    ).order_by('status'))
     
-    # Calculate online vs not online devices
-    active_devices = Device.objects.filter(
-        status='online'
-    ).count()
+    # Calculate online vs not online devices from the status counts
+    devices_total = sum(row['count'] for row in status_counts)
+    active_devices = sum(row['count'] for row in status_counts if row['status'] == 'online')
     inactive_devices = devices_total - active_devices
     
     # Get recent telemetry count
@@ -115,8 +144,9 @@ def index(request):
     ).count()
     
     # Get the most recent anomalies
-    recent_anomalies = AnomalyDetection.objects.select_related('device').order_by(
-        '-timestamp'
+    recent_anomalies = AnomalyDetection.objects.order_by('-timestamp').values(
+        'severity', 'description', 'timestamp',
+        device_name=F('device__name')
     )[:5]
     
     context = {
@@ -139,19 +169,15 @@ def device_detail(request, device_id):
     device = get_object_or_404(Device.objects.select_related('device_type'), id=device_id)
     
     # Get time range from query parameters
-    hours = request.GET.get('hours', 24)
-    try:
-        hours = int(hours)
-    except ValueError:
-        hours = 24  # Default to 24 hours if invalid
+    hours = bounded_int(request.GET.get('hours'), 24, 1, MAX_HOURS)
     
     time_range = timezone.now() - timedelta(hours=hours)
     
-    # Get recent telemetry for this device
+    # Get recent telemetry for this device; the chart only needs these two columns
     telemetry = Telemetry.objects.filter(
         device=device,
         timestamp__gte=time_range
-    ).order_by('-timestamp')[:100]
+    ).order_by('-timestamp').values('timestamp', 'data')[:100]
     
     # Get recent anomalies for this device
     anomalies = AnomalyDetection.objects.filter(
@@ -164,14 +190,7 @@ def device_detail(request, device_id):
     timestamps = []
     
     # Determine what fields we need to extract based on device type
-    if device.device_type.name == 'temperature':
-        fields = ['temperature', 'humidity', 'battery']
-    elif device.device_type.name == 'vibration':
-        fields = ['velocity_rms', 'frequency', 'temperature']
-    elif device.device_type.name == 'flow':
-        fields = ['flow_rate', 'pressure', 'temperature']
-    else:
-        fields = []
+    fields = DEVICE_TYPE_FIELDS.get(device.device_type.name, ())
     
     # Initialize data structure
     for field in fields:
@@ -179,24 +198,22 @@ def device_detail(request, device_id):
     
     # Extract telemetry data
     for item in reversed(telemetry):  # Reverse to get chronological order
-        if 'status' in item.data and item.data['status'] == 'error':
+        data = item['data']
+        if data.get('status') == 'error':
             continue  # Skip error readings
             
-        timestamps.append(item.timestamp.isoformat())
+        timestamps.append(item['timestamp'])
         
         for field in fields:
-            if field in item.data:
-                telemetry_data[field].append(item.data[field])
-            else:
-                telemetry_data[field].append(None)
+            telemetry_data[field].append(data.get(field))
     
     context = {
         'device': device,
         'telemetry': telemetry,
         'anomalies': anomalies,
         'hours': hours,
-        'telemetry_data': json.dumps(telemetry_data),
-        'timestamps': json.dumps(timestamps),
+        'telemetry_data': orjson.dumps(telemetry_data).decode(),
+        'timestamps': orjson.dumps(timestamps).decode(),
         'fields': fields,
     }
     
@@ -211,7 +228,7 @@ def anomaly_list(request):
     acknowledged = request.GET.get('acknowledged')
     
     # Build the queryset with filters
-    anomalies = AnomalyDetection.objects.select_related('device', 'device__device_type').all()
+    anomalies = AnomalyDetection.objects.all()
     
     if severity:
         anomalies = anomalies.filter(severity=severity)
@@ -224,12 +241,22 @@ def anomaly_list(request):
     # Order by timestamp (newest first)
     anomalies = anomalies.order_by('-timestamp')
     
+    # Only the columns the template shows, as dicts rather than model instances
+    anomalies = anomalies.values(
+        'id', 'device_id', 'timestamp', 'severity', 'description', 'acknowledged',
+        device_name=F('device__name'),
+        device_type_name=F('device__device_type__name')
+    )
+    
     # Get unique filter options for the UI
-    device_types = DeviceType.objects.all()
+    device_types = device_type_options()
     severity_choices = [choice[0] for choice in AnomalyDetection.SEVERITY_CHOICES]
     
+    anomalies, page_query = paginate(request, anomalies)
+    
     context = {
         'anomalies': anomalies,
+        'page_query': page_query,
         'device_types': device_types,
         'severity_choices': severity_choices,
         'active_filters': {
@@ -245,48 +272,42 @@ def anomaly_list(request):
 def metrics_dashboard(request):
     """View for monitoring system-wide metrics."""
     # Get time range from query parameters
-    days = request.GET.get('days', 7)
-    try:
-        days = int(days)
-    except ValueError:
-        days = 7  # Default to 7 days if invalid
+    days = bounded_int(request.GET.get('days'), 7, 1, MAX_DAYS)
     
-    time_range = timezone.now() - timedelta(days=days)
+    # Count per calendar day, from days - 1 days ago up to and including today
+    first_day = timezone.localdate() - timedelta(days=days - 1)
+    dates = [(first_day + timedelta(days=day)).isoformat() for day in range(days)]
+    time_range = timezone.make_aware(datetime.combine(first_day, time.min))
     
     # Calculate daily telemetry counts
-    daily_counts = []
-    for day in range(days):
-        day_start = time_range + timedelta(days=day)
-        day_end = day_start + timedelta(days=1)
-        count = Telemetry.objects.filter(
-            timestamp__gte=day_start,
-            timestamp__lt=day_end
-        ).count()
-        daily_counts.append({
-            'date': day_start.date().isoformat(),
-            'count': count
-        })
+    telemetry_by_day = {
+        row['day'].isoformat(): row['count']
+        for row in Telemetry.objects.filter(timestamp__gte=time_range)
+        .annotate(day=TruncDate('timestamp')).values('day')
+        .annotate(count=Count('id')).order_by('day')
+    }
+    daily_counts = [
+        {'date': date, 'count': telemetry_by_day.get(date, 0)}
+        for date in dates
+    ]
     
     # Calculate daily anomaly counts by severity
-    severity_data = []
-    for severity in ['low', 'medium', 'high', 'critical']:
-        daily_data = []
-        for day in range(days):
-            day_start = time_range + timedelta(days=day)
-            day_end = day_start + timedelta(days=1)
-            count = AnomalyDetection.objects.filter(
-                timestamp__gte=day_start,
-                timestamp__lt=day_end,
-                severity=severity
-            ).count()
-            daily_data.append({
-                'date': day_start.date().isoformat(),
-                'count': count
-            })
-        severity_data.append({
+    anomalies_by_day = {
+        (row['severity'], row['day'].isoformat()): row['count']
+        for row in AnomalyDetection.objects.filter(timestamp__gte=time_range)
+        .annotate(day=TruncDate('timestamp')).values('severity', 'day')
+        .annotate(count=Count('id')).order_by()
+    }
+    severity_data = [
+        {
             'severity': severity,
-            'data': daily_data
-        })
+            'data': [
+                {'date': date, 'count': anomalies_by_day.get((severity, date), 0)}
+                for date in dates
+            ]
+        }
+        for severity in ['low', 'medium', 'high', 'critical']
+    ]
     
     # Calculate device type distribution
     device_counts = DeviceType.objects.annotate(
@@ -300,15 +321,20 @@ def metrics_dashboard(request):
     
     context = {
         'days': days,
-        'daily_counts': json.dumps(daily_counts),
-        'severity_counts': json.dumps(severity_data),
-        'device_counts': json.dumps(list(device_counts)),
-        'status_counts': json.dumps(list(status_counts))
+        'daily_counts': orjson.dumps(daily_counts).decode(),
+        'severity_counts': orjson.dumps(severity_data).decode(),
+        'device_counts': orjson.dumps(list(device_counts)).decode(),
+        'status_counts': orjson.dumps(list(status_counts)).decode()
     }
     
     return render(request, 'dashboard/metrics.html', context)
 
 
+def live_stream(request):
+    """View showing telemetry and anomalies as they arrive over the ws/telemetry/ WebSocket."""
+    return render(request, 'dashboard/live_stream.html')
+
+
 def acknowledge_anomaly(request, anomaly_id):
     """Handle anomaly acknowledgment."""
     if request.method == 'POST':
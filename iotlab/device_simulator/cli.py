@@ -5,25 +5,27 @@ Command-line interface for the IoT device simulator.
 
 import os
 import sys
-import time
-import json
 import random
 import signal
 import logging
 import argparse
+import functools
+import threading
 from pathlib import Path
 from datetime import datetime
 
+import orjson
+
 # Support running as a script or module
 try:
     from .simulator import DeviceSimulator
-    from .device_types import DEVICE_TYPES
+    from .device_types import DEVICE_TYPE_NAMES
 except ImportError:
     CURRENT_DIR = Path(__file__).resolve().parent
     if str(CURRENT_DIR) not in sys.path:
         sys.path.insert(0, str(CURRENT_DIR))
     from simulator import DeviceSimulator  # type: ignore
-    from device_types import DEVICE_TYPES  # type: ignore
+    from device_types import DEVICE_TYPE_NAMES  # type: ignore
 
 # Configure logging
 logging.basicConfig(
@@ -37,9 +39,13 @@ logger = logging.getLogger(__name__)
 # Global simulator instance
 simulator = None
 
+# Set by the signal handler to stop the simulator
+stop = threading.Event()
 
-def setup_args():
-    """Set up command line arguments."""
+
+@functools.lru_cache(maxsize=1)
+def _get_parser():
+    """Build the argument parser (once per process)."""
     parser = argparse.ArgumentParser(description="IoT Device Simulator")
     
     # MQTT connection settings
@@ -50,7 +56,7 @@ def setup_args():
     
     # Device settings
     parser.add_argument('--device-type', default='temperature',
-                        choices=list(DEVICE_TYPES.keys()),
+                        choices=DEVICE_TYPE_NAMES,
                         help='Type of device to simulate')
     parser.add_argument('--count', type=int, default=10,
                         help='Number of devices to simulate (default: 10)')
@@ -73,15 +79,18 @@ def setup_args():
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Enable verbose logging')
     
-    return parser.parse_args()
+    return parser
+
+
+def setup_args():
+    """Set up command line arguments."""
+    return _get_parser().parse_args()
 
 
 def signal_handler(signal, frame):
     """Handle Ctrl+C gracefully."""
     logger.info("Shutting down simulator...")
-    if simulator:
-        simulator.stop()
-    sys.exit(0)
+    stop.set()
 
 
 def main():
@@ -97,6 +106,7 @@ def main():
     
     # Register signal handler
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     
     # Create the simulator
     simulator = DeviceSimulator(
@@ -145,8 +155,9 @@ def main():
     if args.output_file:
         try:
             device_info = simulator.get_all_devices_info()
-            with open(args.output_file, 'w') as f:
-                json.dump(device_info, f, indent=2)
+            Path(args.output_file).write_bytes(
+                orjson.dumps(device_info, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+            )
             logger.info(f"Saved device information to {args.output_file}")
         except Exception as e:
             logger.error(f"Failed to save device information: {e}")
@@ -154,14 +165,15 @@ def main():
     # Run for the specified time or indefinitely
     if args.runtime > 0:
         logger.info(f"Running simulator for {args.runtime} seconds")
-        time.sleep(args.runtime)
-        simulator.stop()
-        return 0
+        stop.wait(args.runtime)
     else:
         logger.info("Simulator running. Press Ctrl+C to stop.")
-        # Keep the main thread alive
-        while True:
-            time.sleep(1)
+        # Wake up every second so the signal handler gets to run on every platform
+        while not stop.wait(1):
+            pass
+    
+    simulator.stop()
+    return 0
 
 
 if __name__ == "__main__":
@@ -3,17 +3,42 @@ Device type definitions for the IoT simulator.
 Each device type has a specific schema and behavior for generating telemetry data.
 """
 
+import bisect
 import random
 import time
+import types
 import uuid
 import math
 from datetime import datetime
 import numpy as np
 
+# Number of uniform samples drawn per refill of a device's noise buffer
+NOISE_BUFFER_SIZE = 1024
+
+_rng = np.random.default_rng()
+
+# Most recent ISO timestamp, shared by all devices ticking on the same clock
+_TS_CACHE = {"t": 0.0, "s": ""}
+
+
+def now_iso():
+    """Current UTC time as an ISO string, reused for calls within 1 ms."""
+    t = time.time()
+    if t - _TS_CACHE["t"] > 0.001:
+        _TS_CACHE["t"] = t
+        _TS_CACHE["s"] = datetime.utcfromtimestamp(t).isoformat()
+    return _TS_CACHE["s"]
+
 
 class DeviceType:
     """Base class for all device types."""
     
+    __slots__ = (
+        'device_id', 'name', 'location', 'config', 'created_at',
+        'failure_rate', 'noise_factor', 'last_reading', 'anomaly_counter',
+        'failure_state', 'failure_duration', '_noise_buf', '_noise_i',
+    )
+    
     def __init__(self, device_id=None, name=None, location=None, config=None):
         self.device_id = device_id or str(uuid.uuid4())
         self.name = name or f"{self.__class__.__name__}-{self.device_id[:8]}"
@@ -29,6 +54,10 @@ class DeviceType:
         self.failure_state = False
         self.failure_duration = 0
         
+        # Pre-drawn uniform samples consumed by add_noise
+        self._noise_buf = np.empty(NOISE_BUFFER_SIZE, dtype=np.float32)
+        self._noise_i = NOISE_BUFFER_SIZE
+        
     def get_schema(self):
         """Get the data schema for this device type."""
         raise NotImplementedError
@@ -56,8 +85,12 @@ class DeviceType:
         """Add random noise to a value."""
         if factor is None:
             factor = self.noise_factor
-        noise = (random.random() * 2 - 1) * factor * value
-        return value + noise
+        if self._noise_i >= NOISE_BUFFER_SIZE:
+            _rng.random(out=self._noise_buf, dtype=np.float32)
+            self._noise_i = 0
+        n = float(self._noise_buf[self._noise_i])
+        self._noise_i += 1
+        return value * (1 + (n * 2 - 1) * factor)
     
     def detect_anomalies(self, data):
         """Detect anomalies in the telemetry data."""
@@ -78,6 +111,15 @@ class DeviceType:
 class TemperatureSensor(DeviceType):
     """Temperature sensor device type."""
     
+    __slots__ = ('base_temperature', 'daily_variation', 'hourly_noise')
+    
+    _SCHEMA = {
+        "temperature": "number",  # Celsius
+        "humidity": "number",     # Percentage
+        "battery": "number",      # Percentage
+        "status": "string"
+    }
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.base_temperature = random.uniform(19.0, 22.0)  # Base temperature in Celsius
@@ -85,21 +127,16 @@ class TemperatureSensor(DeviceType):
         self.hourly_noise = random.uniform(0.1, 0.5)        # Hourly noise factor
         
     def get_schema(self):
-        return {
-            "temperature": "number",  # Celsius
-            "humidity": "number",     # Percentage
-            "battery": "number",      # Percentage
-            "status": "string"
-        }
+        return self._SCHEMA
     
     def generate_telemetry(self):
         # Simulate failure
         if self.simulate_failure():
             return {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": now_iso(),
                 "data": {
                     "status": "error",
-                    "error_code": f"E{random.randint(1, 9)}{random.randint(0, 9)}{random.randint(0, 9)}"
+                    "error_code": f"E{random.randint(100, 999)}"
                 }
             }
         
@@ -131,7 +168,7 @@ class TemperatureSensor(DeviceType):
         anomalies = self.detect_anomalies(data)
         
         telemetry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now_iso(),
             "data": data
         }
         
@@ -141,6 +178,81 @@ class TemperatureSensor(DeviceType):
         self.last_reading = data
         return telemetry
     
+    @classmethod
+    def generate_batch(cls, devices, now=None):
+        """
+        Generate one reading for each of several temperature sensors.
+        
+        Equivalent to calling generate_telemetry() on every device, but the
+        temperature and humidity math runs as array operations over all
+        healthy devices at once.
+        
+        Args:
+            devices: Sequence of TemperatureSensor instances
+            now: Epoch seconds to evaluate the daily/hourly cycles at
+        
+        Returns:
+            List of telemetry dicts, in the same order as ``devices``
+        """
+        if now is None:
+            now = time.time()
+        
+        results = [None] * len(devices)
+        healthy = []
+        for i, device in enumerate(devices):
+            if device.simulate_failure():
+                results[i] = {
+                    "timestamp": now_iso(),
+                    "data": {
+                        "status": "error",
+                        "error_code": f"E{random.randint(100, 999)}"
+                    }
+                }
+            else:
+                healthy.append(i)
+        
+        if not healthy:
+            return results
+        
+        batch = [devices[i] for i in healthy]
+        n = len(batch)
+        base = np.fromiter((d.base_temperature for d in batch), dtype=np.float64, count=n)
+        daily = np.fromiter((d.daily_variation for d in batch), dtype=np.float64, count=n)
+        hourly = np.fromiter((d.hourly_noise for d in batch), dtype=np.float64, count=n)
+        noise = np.fromiter((d.noise_factor for d in batch), dtype=np.float64, count=n)
+        
+        day_factor = math.sin(now / 86400 * 2 * math.pi)  # Daily cycle
+        hour_factor = math.sin(now / 3600 * 2 * math.pi)  # hourly cycle
+        
+        temperature = base + day_factor * daily + hour_factor * hourly
+        temperature *= 1 + (_rng.random(n) * 2 - 1) * noise
+        
+        humidity = np.clip(100 - (temperature - 10) * 2, 30, 95)
+        humidity *= 1 + (_rng.random(n) * 2 - 1) * noise
+        
+        battery_level = round(100 - (((now % 2592000) / 2592000) * 20), 2)
+        timestamp = now_iso()
+        
+        readings = zip(batch, np.round(temperature, 2).tolist(), np.round(humidity, 2).tolist())
+        for i, (device, temp, hum) in zip(healthy, readings):
+            data = {
+                "temperature": temp,
+                "humidity": hum,
+                "battery": battery_level,
+                "status": "normal"
+            }
+            telemetry = {
+                "timestamp": timestamp,
+                "data": data
+            }
+            anomalies = device.detect_anomalies(data)
+            if anomalies:
+                telemetry["anomalies"] = anomalies
+            device.last_reading = data
+            results[i] = telemetry
+        
+        return results
+    
     def detect_anomalies(self, data):
         anomalies = []
         
@@ -198,6 +310,28 @@ class TemperatureSensor(DeviceType):
 class VibrationSensor(DeviceType):
     """Vibration and acceleration sensor device type."""
     
+    __slots__ = ('machine_type', 'base_frequency', 'base_amplitude')
+    
+    _SCHEMA = {
+        "acceleration_x": "number",  # m^s2
+        "acceleration_y": "number",  # m^s2
+        "acceleration_z": "number",  # m^s2
+        "velocity_rms": "number",    # mm^s
+        "frequency": "number",       # Hz
+        "temperature": "number",     # Celsius
+        "machine_state": "string"    # on/off/starting/stopping
+    }
+    
+    # Next machine state as (states, cumulative weights), keyed by the previous state
+    _STATE_TRANSITIONS = {
+        "default": (
+            ("on", "on", "on", "on", "on", "off", "starting", "stopping"),
+            (0.7, 1.4, 2.1, 2.8, 3.5, 3.6, 3.7, 3.8),
+        ),
+        "starting": (("on", "starting"), (0.7, 1.0)),
+        "stopping": (("off", "stopping"), (0.7, 1.0)),
+    }
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.machine_type = random.choice(["pump", "motor", "compressor", "fan"])
@@ -205,39 +339,31 @@ class VibrationSensor(DeviceType):
         self.base_amplitude = random.uniform(0.5, 2.0)  # Base amplitude in mm/s
         
     def get_schema(self):
-        return {
-            "acceleration_x": "number",  # m^s2
-            "acceleration_y": "number",  # m^s2
-            "acceleration_z": "number",  # m^s2
-            "velocity_rms": "number",    # mm^s
-            "frequency": "number",       # Hz
-            "temperature": "number",     # Celsius
-            "machine_state": "string"    # on/off/starting/stopping
-        }
+        return self._SCHEMA
     
     def generate_telemetry(self):
         # Simulate failure
         if self.simulate_failure():
             return {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": now_iso(),
                 "data": {
                     "machine_state": "fault",
-                    "error_code": f"F{random.randint(1, 9)}{random.randint(0, 9)}{random.randint(0, 9)}"
+                    "error_code": f"F{random.randint(100, 999)}"
                 }
             }
         
+        # Shared time argument for the oscillation angles below
+        current_time = time.time()
+        
         # Determine machine state
-        states = ["on", "on", "on", "on", "on", "off", "starting", "stopping"]
-        weights = [0.7, 0.7, 0.7, 0.7, 0.7, 0.1, 0.1, 0.1]
+        states, cum_weights = self._STATE_TRANSITIONS["default"]
         
         if self.last_reading and self.last_reading.get("machine_state") == "starting":
-            states = ["on", "starting"]
-            weights = [0.7, 0.3]
+            states, cum_weights = self._STATE_TRANSITIONS["starting"]
         elif self.last_reading and self.last_reading.get("machine_state") == "stopping":
-            states = ["off", "stopping"]
-            weights = [0.7, 0.3]
+            states, cum_weights = self._STATE_TRANSITIONS["stopping"]
             
-        machine_state = random.choices(states, weights=weights)[0]
+        machine_state = states[bisect.bisect(cum_weights, random.random() * cum_weights[-1])]
         
         # Generate vibration characteristics based on machine state
         if machine_state == "on":
@@ -249,8 +375,9 @@ class VibrationSensor(DeviceType):
             amplitude = self.add_noise(amplitude, 0.15)
             
             # Generate 3-axis acceleration
-            accel_x = amplitude * math.sin(time.time() * frequency * 0.1)
-            accel_y = amplitude * math.cos(time.time() * frequency * 0.1)
+            angle = current_time * frequency * 0.1
+            accel_x = amplitude * math.sin(angle)
+            accel_y = amplitude * math.cos(angle)
             accel_z = self.add_noise(amplitude * 0.5, 0.2)
             
             # RMS velocity
@@ -266,8 +393,9 @@ class VibrationSensor(DeviceType):
             frequency = self.base_frequency * random.uniform(0.5, 1.5)
             amplitude = self.base_amplitude * random.uniform(1.5, 2.5)
             
-            accel_x = amplitude * math.sin(time.time() * frequency * 0.2)
-            accel_y = amplitude * math.cos(time.time() * frequency * 0.2)
+            angle = current_time * frequency * 0.2
+            accel_x = amplitude * math.sin(angle)
+            accel_y = amplitude * math.cos(angle)
             accel_z = self.add_noise(amplitude * 0.7, 0.3)
             
             velocity_rms = amplitude * random.uniform(0.9, 1.3)
@@ -278,8 +406,9 @@ class VibrationSensor(DeviceType):
             frequency = self.base_frequency * random.uniform(0.3, 0.8)
             amplitude = self.base_amplitude * random.uniform(0.7, 1.5)
             
-            accel_x = amplitude * math.sin(time.time() * frequency * 0.05)
-            accel_y = amplitude * math.cos(time.time() * frequency * 0.05)
+            angle = current_time * frequency * 0.05
+            accel_x = amplitude * math.sin(angle)
+            accel_y = amplitude * math.cos(angle)
             accel_z = self.add_noise(amplitude * 0.4, 0.15)
             
             velocity_rms = amplitude * 0.6
@@ -301,8 +430,9 @@ class VibrationSensor(DeviceType):
         if machine_state == "on" and random.random() < 0.05:
             harmonic_factor = random.choice([0.5, 2.0, 3.0])
             harmonic_amplitude = amplitude * random.uniform(0.2, 0.5)
-            accel_x += harmonic_amplitude * math.sin(time.time() * frequency * harmonic_factor)
-            accel_y += harmonic_amplitude * math.cos(time.time() * frequency * harmonic_factor)
+            angle = current_time * frequency * harmonic_factor
+            accel_x += harmonic_amplitude * math.sin(angle)
+            accel_y += harmonic_amplitude * math.cos(angle)
             
             self.anomaly_counter += 1
         else:
@@ -323,7 +453,7 @@ class VibrationSensor(DeviceType):
         anomalies = self.detect_anomalies(data)
         
         telemetry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now_iso(),
             "data": data
         }
         
@@ -382,9 +512,30 @@ class VibrationSensor(DeviceType):
         return anomalies
 
 
+# Flow demand factor for each hour of the day
+_FLOW_FACTORS = (
+    (0.6,) * 6 +   # Midnight to 6 AM
+    (1.2,) * 3 +   # 6 AM to 9 AM (morning peak)
+    (1.0,) * 8 +   # 9 AM to 5 PM
+    (1.1,) * 5 +   # 5 PM to 10 PM (evening peak)
+    (0.8,) * 2     # 10 PM to midnight
+)
+
+
 class FlowMeter(DeviceType):
     """Flow meter device type."""
     
+    __slots__ = ('fluid_type', 'pipe_diameter', 'target_flow_rate', 'base_pressure')
+    
+    _SCHEMA = {
+        "flow_rate": "number",     # L/min
+        "pressure": "number",      # bar
+        "temperature": "number",   # Celsius
+        "total_flow": "number",    # Cumulative L
+        "fluid_type": "string",
+        "status": "string"
+    }
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.fluid_type = random.choice(["water", "oil", "gas", "coolant"])
@@ -393,23 +544,16 @@ class FlowMeter(DeviceType):
         self.base_pressure = random.uniform(2, 10)  # bar
         
     def get_schema(self):
-        return {
-            "flow_rate": "number",     # L/min
-            "pressure": "number",      # bar
-            "temperature": "number",   # Celsius
-            "total_flow": "number",    # Cumulative L
-            "fluid_type": "string",
-            "status": "string"
-        }
+        return self._SCHEMA
     
     def generate_telemetry(self):
         # Simulate failure
         if self.simulate_failure():
             return {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": now_iso(),
                 "data": {
                     "status": "error",
-                    "error_code": f"E{random.randint(1, 9)}{random.randint(0, 9)}{random.randint(0, 9)}",
+                    "error_code": f"E{random.randint(100, 999)}",
                     "fluid_type": self.fluid_type
                 }
             }
@@ -419,19 +563,8 @@ class FlowMeter(DeviceType):
         hour_of_day = (current_time % 86400) / 3600  # 0-24 hour of day
         
         # Flow pattern based on time of day (lower at night, peaks in morning and evening)
-        if hour_of_day < 6:  # Midnight to 6 AM
-            flow_factor = 0.6
-        elif hour_of_day < 9:  # 6 AM to 9 AM (morning peak)
-            flow_factor = 1.2
-        elif hour_of_day < 17:  # 9 AM to 5 PM
-            flow_factor = 1.0
-        elif hour_of_day < 22:  # 5 PM to 10 PM (evening peak)
-            flow_factor = 1.1
-        else:  # 10 PM to midnight
-            flow_factor = 0.8
-            
-        # Add some random variations to the flow
-        flow_factor += random.uniform(-0.1, 0.1)
+        # plus some random variation
+        flow_factor = _FLOW_FACTORS[int(hour_of_day)] + random.uniform(-0.1, 0.1)
         
         # Calculate the flow rate
         flow_rate = self.target_flow_rate * flow_factor
@@ -486,7 +619,7 @@ class FlowMeter(DeviceType):
         anomalies = self.detect_anomalies(data)
         
         telemetry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": now_iso(),
             "data": data
         }
         
@@ -562,4 +695,11 @@ DEVICE_TYPES = {
     "temperature": TemperatureSensor,
     "vibration": VibrationSensor,
     "flow": FlowMeter
-} 
\ No newline at end of file
+}
+
+# Names of the available device types (e.g. for argparse choices)
+DEVICE_TYPE_NAMES = tuple(DEVICE_TYPES.keys())
+
+# Read-only view so the registry cannot be mutated at runtime
+DEVICE_TYPES = types.MappingProxyType(DEVICE_TYPES)
+ 
\ No newline at end of file
@@ -6,12 +6,14 @@ that generate telemetry data and publish it to an MQTT broker.
 """
 
 import time
-import json
 import uuid
+import heapq
 import logging
+import itertools
 import threading
 import random
 from datetime import datetime
+import orjson
 import paho.mqtt.client as mqtt
 
 from .device_types import DEVICE_TYPES
@@ -21,7 +23,12 @@ logger = logging.getLogger(__name__)
 
 
 class DeviceRegistry:
-    """Registry for keeping track of all simulated devices."""
+    """
+    Registry for keeping track of all simulated devices.
+    
+    Writers copy the device dict and rebind it under the lock, so readers
+    always see a complete snapshot and never need to take the lock.
+    """
     
     def __init__(self):
         self.devices = {}
@@ -30,31 +37,32 @@ class DeviceRegistry:
     def add_device(self, device):
         """Add a device to the registry."""
         with self.lock:
-            self.devices[device.device_id] = device
+            devices = dict(self.devices)
+            devices[device.device_id] = device
+            self.devices = devices
         return device
     
     def get_device(self, device_id):
         """Get a device from the registry."""
-        with self.lock:
-            return self.devices.get(device_id)
+        return self.devices.get(device_id)
     
     def remove_device(self, device_id):
         """Remove a device from the registry."""
         with self.lock:
             if device_id in self.devices:
-                del self.devices[device_id]
+                devices = dict(self.devices)
+                del devices[device_id]
+                self.devices = devices
                 return True
         return False
     
     def get_all_devices(self):
         """Get all devices in the registry."""
-        with self.lock:
-            return list(self.devices.values())
+        return list(self.devices.values())
     
     def get_device_count(self):
         """Get the number of devices in the registry."""
-        with self.lock:
-            return len(self.devices)
+        return len(self.devices)
 
 
 class DeviceSimulator:
@@ -62,9 +70,10 @@ class DeviceSimulator:
     Simulator for IoT devices that publishes telemetry data to an MQTT broker.
     """
     
-    def __init__(self, broker_host="localhost", broker_port=1883, client_id=None):
+    def __init__(self, broker_host="localhost", broker_port=1883, client_id=None, reconnect_cap=30):
         self.broker_host = broker_host
         self.broker_port = broker_port
+        self.reconnect_cap = reconnect_cap
         self.client_id = client_id or f"device_simulator_{uuid.uuid4().hex[:8]}"
         
         # Set up MQTT client
@@ -72,13 +81,23 @@ class DeviceSimulator:
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         
-        # Set up device registry
+        # Only one reconnect attempt runs at a time
+        self._reconnecting = False
+        self._reconnect_lock = threading.Lock()
+        
+        # Set up device registry and each device's publish topic
         self.registry = DeviceRegistry()
+        self._topics = {}
         
-        # Set up thread management
+        # Set up publish scheduling: one thread serves every running device
+        # from a min-heap of (next_fire_time, entry_id, device_id)
         self.running = False
-        self.threads = {}
-        self.main_thread = None
+        self.running_devices = {}  # device_id -> publish interval
+        self._pending = {}  # device_id -> entry_id of its live schedule entry
+        self._schedule = []
+        self._entry_ids = itertools.count()
+        self._schedule_cond = threading.Condition()
+        self.scheduler_thread = None
         
         # Configure logger
         self.logger = logging.getLogger(__name__)
@@ -94,25 +113,35 @@ class DeviceSimulator:
         """Callback when disconnected from the MQTT broker."""
         if rc != 0:
             self.logger.warning(f"Unexpected disconnection from MQTT broker: {rc}")
-            # Try to reconnect in a separate thread
-            threading.Thread(target=self._reconnect).start()
+            # Try to reconnect in a separate thread unless one is already trying
+            with self._reconnect_lock:
+                if self._reconnecting:
+                    return
+                self._reconnecting = True
+            threading.Thread(target=self._reconnect, daemon=True).start()
     
     def _reconnect(self, max_retries=5):
         """Attempt to reconnect to the MQTT broker."""
         retries = 0
-        while retries < max_retries:
-            try:
-                self.logger.info(f"Attempting to reconnect to MQTT broker (attempt {retries+1}/{max_retries})...")
-                self.client.reconnect()
-                self.logger.info("Successfully reconnected to MQTT broker")
-                return True
-            except Exception as e:
-                self.logger.error(f"Failed to reconnect: {e}")
-                retries += 1
-                time.sleep(2 ** retries)  # Exponential backoff
-        
-        self.logger.error(f"Failed to reconnect after {max_retries} attempts")
-        return False
+        try:
+            while retries < max_retries:
+                try:
+                    self.logger.info(f"Attempting to reconnect to MQTT broker (attempt {retries+1}/{max_retries})...")
+                    self.client.reconnect()
+                    self.logger.info("Successfully reconnected to MQTT broker")
+                    return True
+                except Exception as e:
+                    self.logger.error(f"Failed to reconnect: {e}")
+                    retries += 1
+                    # Capped exponential backoff, jittered so a fleet of
+                    # simulators doesn't reconnect in lockstep
+                    time.sleep(min(self.reconnect_cap, 2 ** retries) * random.uniform(0.5, 1.5))
+            
+            self.logger.error(f"Failed to reconnect after {max_retries} attempts")
+            return False
+        finally:
+            with self._reconnect_lock:
+                self._reconnecting = False
     
     def connect(self):
         """Connect to the MQTT broker."""
@@ -147,16 +176,18 @@ class DeviceSimulator:
         device_class = DEVICE_TYPES[device_type]
         device = device_class(**kwargs)
         self.registry.add_device(device)
+        self._topics[device.device_id] = f"telemetry/{device.device_id}"
         self.logger.info(f"Added {device_type} device: {device.name} ({device.device_id})")
         return device
     
     def remove_device(self, device_id):
         """Remove a device from the simulator."""
         if self.registry.remove_device(device_id):
-            # Stop the device thread if it's running
-            if device_id in self.threads:
-                self.threads[device_id].running = False
-                del self.threads[device_id]
+            self._topics.pop(device_id, None)
+            # Take the device off the schedule if it's running
+            with self._schedule_cond:
+                self.running_devices.pop(device_id, None)
+                self._pending.pop(device_id, None)
             self.logger.info(f"Removed device: {device_id}")
             return True
         return False
@@ -168,13 +199,8 @@ class DeviceSimulator:
             self.logger.warning(f"Device not found: {device_id}")
             return False
         
-        topic = f"telemetry/{device_id}"
-        payload = json.dumps(telemetry)
-        
         try:
-            result = self.client.publish(topic, payload)
-            if result.rc != 0:
-                self.logger.error(f"Failed to publish telemetry: {result}")
+            if not self._publish(device_id, telemetry):
                 return False
             
             self.logger.debug(f"Published telemetry for device {device_id}")
@@ -184,36 +210,88 @@ class DeviceSimulator:
             self.logger.error(f"Error publishing telemetry: {e}")
             return False
     
-    def _device_thread(self, device_id, interval):
-        """Thread function for each device."""
-        thread_local = threading.local()
-        thread_local.running = True
-        
-        device = self.registry.get_device(device_id)
-        if not device:
-            self.logger.error(f"Device not found for thread: {device_id}")
-            return
-        
-        self.logger.info(f"Started device thread for {device.name} ({device_id})")
+    def _publish(self, device_id, telemetry):
+        """Encode a reading and hand it to paho; returns whether it was accepted."""
+        result = self.client.publish(
+            self._topics[device_id],
+            orjson.dumps(telemetry, option=orjson.OPT_SERIALIZE_NUMPY)
+        )
+        if result.rc != 0:
+            self.logger.error(f"Failed to publish telemetry: {result}")
+            return False
+        return True
+    
+    def _generate_readings(self, devices):
+        """
+        Generate one reading per device as (device, telemetry) pairs.
         
-        # Store thread reference
-        self.threads[device_id] = thread_local
+        Devices whose type has a generate_batch classmethod are generated
+        together, one call per type; the rest one at a time.
+        """
+        readings = []
+        batches = {}
+        for device in devices:
+            device_class = type(device)
+            if hasattr(device_class, 'generate_batch'):
+                batches.setdefault(device_class, []).append(device)
+                continue
+            try:
+                readings.append((device, device.generate_telemetry()))
+            except Exception as e:
+                self.logger.error(f"Error generating telemetry for device {device.device_id}: {e}")
         
-        while thread_local.running and self.running:
+        for device_class, batch in batches.items():
             try:
-                # Generate telemetry
-                telemetry = device.generate_telemetry()
-                
-                # Publish to MQTT
-                self.publish_telemetry(device_id, telemetry)
-                
+                readings.extend(zip(batch, device_class.generate_batch(batch)))
             except Exception as e:
-                self.logger.error(f"Error in device thread {device_id}: {e}")
+                self.logger.error(f"Error generating telemetry for {len(batch)} {device_class.__name__} devices: {e}")
+        return readings
+    
+    def _schedule_device(self, device_id, fire_time):
+        """Queue a device's next publish. Caller must hold _schedule_cond."""
+        entry_id = next(self._entry_ids)
+        self._pending[device_id] = entry_id
+        heapq.heappush(self._schedule, (fire_time, entry_id, device_id))
+        self._schedule_cond.notify()
+    
+    def _scheduler_loop(self):
+        """Thread function publishing telemetry for all running devices."""
+        self.logger.info("Started device scheduler")
+        
+        while self.running:
+            with self._schedule_cond:
+                # Sleep until the earliest device is due (or the schedule changes)
+                now = time.monotonic()
+                if not self._schedule or self._schedule[0][0] > now:
+                    timeout = self._schedule[0][0] - now if self._schedule else None
+                    self._schedule_cond.wait(timeout)
+                    continue
+                
+                # Collect every device that is due this tick
+                due = []
+                while self._schedule and self._schedule[0][0] <= now:
+                    _, entry_id, device_id = heapq.heappop(self._schedule)
+                    
+                    # Skip entries left behind by stopped or restarted devices
+                    if self._pending.get(device_id) != entry_id:
+                        continue
+                    
+                    self._schedule_device(device_id, now + self.running_devices[device_id])
+                    due.append(device_id)
+            
+            # Generate the tick's readings, then publish them back-to-back so
+            # paho can coalesce the writes
+            get_device = self.registry.get_device
+            devices = [device for device in map(get_device, due) if device]
+            for device, telemetry in self._generate_readings(devices):
+                try:
+                    self._publish(device.device_id, telemetry)
+                except Exception as e:
+                    self.logger.error(f"Error publishing for device {device.device_id}: {e}")
             
-            # Wait for next interval
-            time.sleep(interval)
+            self.logger.debug(f"Published telemetry for {len(due)} devices")
         
-        self.logger.info(f"Stopped device thread for {device.name} ({device_id})")
+        self.logger.info("Stopped device scheduler")
     
     def start_device(self, device_id, interval=60):
         """Start a device publishing telemetry data."""
@@ -222,28 +300,28 @@ class DeviceSimulator:
             self.logger.warning(f"Device not found: {device_id}")
             return False
         
-        if device_id in self.threads:
-            self.logger.warning(f"Device already running: {device_id}")
-            return True
-        
-        # Create and start the device thread
-        device_thread = threading.Thread(
-            target=self._device_thread,
-            args=(device_id, interval)
-        )
-        device_thread.daemon = True
-        device_thread.start()
+        with self._schedule_cond:
+            if device_id in self.running_devices:
+                self.logger.warning(f"Device already running: {device_id}")
+                return True
+            
+            # Schedule the first publish immediately
+            self.running_devices[device_id] = interval
+            self._schedule_device(device_id, time.monotonic())
         
+        self.logger.info(f"Started device {device.name} ({device_id})")
         return True
     
     def stop_device(self, device_id):
         """Stop a device from publishing telemetry data."""
-        if device_id in self.threads:
-            self.threads[device_id].running = False
-            del self.threads[device_id]
-            self.logger.info(f"Stopped device: {device_id}")
-            return True
-        return False
+        with self._schedule_cond:
+            if device_id not in self.running_devices:
+                return False
+            # Its heap entry is discarded when it comes due
+            del self.running_devices[device_id]
+            del self._pending[device_id]
+        self.logger.info(f"Stopped device: {device_id}")
+        return True
     
     def start(self):
         """Start the simulator."""
@@ -256,6 +334,10 @@ class DeviceSimulator:
             return False
         
         self.running = True
+        self.scheduler_thread = threading.Thread(target=self._scheduler_loop)
+        self.scheduler_thread.daemon = True
+        self.scheduler_thread.start()
+        
         self.logger.info("Started device simulator")
         return True
     
@@ -265,11 +347,13 @@ class DeviceSimulator:
             self.logger.warning("Simulator is not running")
             return False
         
-        self.running = False
-        
-        # Stop all device threads
-        for device_id in list(self.threads.keys()):
+        # Stop all devices and wake the scheduler so it can exit
+        with self._schedule_cond:
+            self.running = False
+            self._schedule_cond.notify()
+        for device_id in list(self.running_devices.keys()):
             self.stop_device(device_id)
+        self.scheduler_thread.join()
         
         # Disconnect from MQTT broker
         self.disconnect()
@@ -284,7 +368,7 @@ class DeviceSimulator:
             return None
         
         info = device.to_dict()
-        info["is_running"] = device_id in self.threads
+        info["is_running"] = device_id in self.running_devices
         return info
     
     def get_all_devices_info(self):
@@ -292,6 +376,6 @@ class DeviceSimulator:
         devices = []
         for device in self.registry.get_all_devices():
             info = device.to_dict()
-            info["is_running"] = device.device_id in self.threads
+            info["is_running"] = device.device_id in self.running_devices
             devices.append(info)
         return devices 
\ No newline at end of file
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from .device_types import TemperatureSensor, FlowMeter
+from .simulator import DeviceSimulator
+
+# Fixed epoch seconds both generation paths are evaluated at
+NOW = 1760400000.0
+
+
+def sensors(count, noise_factor):
+    return [
+        TemperatureSensor(config={"failure_rate": 0, "noise_factor": noise_factor})
+        for _ in range(count)
+    ]
+
+
+class TemperatureBatchTests(unittest.TestCase):
+    """TemperatureSensor.generate_batch must match generate_telemetry."""
+
+    def single(self, devices):
+        with mock.patch('iotlab.device_simulator.device_types.time.time', return_value=NOW):
+            return [device.generate_telemetry() for device in devices]
+
+    def test_matches_generate_telemetry_without_noise(self):
+        devices = sensors(20, noise_factor=0)
+        expected = self.single(devices)
+        batch = TemperatureSensor.generate_batch(devices, now=NOW)
+
+        self.assertEqual(len(batch), len(devices))
+        for got, want in zip(batch, expected):
+            self.assertEqual(got.keys(), want.keys())
+            self.assertEqual(got["data"].keys(), want["data"].keys())
+            for key, value in want["data"].items():
+                self.assertIs(type(got["data"][key]), type(value), key)
+                if isinstance(value, float):
+                    self.assertAlmostEqual(got["data"][key], value, places=2, msg=key)
+                else:
+                    self.assertEqual(got["data"][key], value, key)
+            self.assertEqual(got.get("anomalies"), want.get("anomalies"))
+
+    def test_noise_stays_within_noise_factor(self):
+        devices = sensors(200, noise_factor=0.05)
+        batch = TemperatureSensor.generate_batch(devices, now=NOW)
+        for device, reading in zip(devices, batch):
+            data = reading["data"]
+            self.assertEqual(set(data), {"temperature", "humidity", "battery", "status"})
+            self.assertTrue(all(type(data[key]) is float for key in ("temperature", "humidity", "battery")))
+
+            device.noise_factor = 0
+            (expected,) = self.single([device])
+            temperature = expected["data"]["temperature"]
+            self.assertLessEqual(abs(data["temperature"] - temperature), abs(temperature) * 0.05 + 0.01)
+            # Humidity follows the noisy temperature, then gets its own noise
+            humidity = max(30, min(95, 100 - (data["temperature"] - 10) * 2))
+            self.assertLessEqual(abs(data["humidity"] - humidity), humidity * 0.05 + 0.05)
+            self.assertAlmostEqual(data["battery"], expected["data"]["battery"], places=2)
+
+    def test_failed_devices_report_errors(self):
+        devices = sensors(3, noise_factor=0)
+        devices[1].failure_rate = 1
+        batch = TemperatureSensor.generate_batch(devices, now=NOW)
+        self.assertEqual(batch[1]["data"]["status"], "error")
+        self.assertEqual(batch[0]["data"]["status"], "normal")
+        self.assertEqual(batch[2]["data"]["status"], "normal")
+
+
+class SchedulerBatchTests(unittest.TestCase):
+    def test_temperature_sensors_are_generated_as_one_batch(self):
+        simulator = DeviceSimulator()
+        devices = [simulator.add_device("temperature") for _ in range(3)]
+        flow = simulator.add_device("flow")
+
+        with mock.patch.object(TemperatureSensor, "generate_batch", wraps=TemperatureSensor.generate_batch) as batch, \
+                mock.patch.object(FlowMeter, "generate_telemetry", autospec=True, return_value={"data": {}}) as single:
+            readings = simulator._generate_readings(devices + [flow])
+
+        batch.assert_called_once_with(devices)
+        single.assert_called_once_with(flow)
+        self.assertEqual([device for device, _ in readings], [flow] + devices)
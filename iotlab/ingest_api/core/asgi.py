@@ -1,20 +1,27 @@
 import os
-import django
 
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iotlab.ingest_api.core.settings')
-django.setup()
 
-from iotlab.ingest_api.telemetry.routing import websocket_urlpatterns  # noqa
+# Set up Django before importing Channels or any app modules
+django_asgi_app = get_asgi_application()
 
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+
+protocols = {
+    "http": django_asgi_app,
+}
+
+# WebSocket routing pulls in the telemetry app; skip it on HTTP-only workers
+if os.environ.get('ENABLE_WS', '1') == '1':
+    from iotlab.ingest_api.telemetry.routing import websocket_urlpatterns  # noqa: E402
+
+    protocols["websocket"] = AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
         )
-    ),
-}) 
\ No newline at end of file
+    )
+
+application = ProtocolTypeRouter(protocols)
\ No newline at end of file
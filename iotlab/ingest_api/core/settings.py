@@ -162,6 +162,13 @@ MQTT_BROKER_HOST = os.getenv('MQTT_BROKER_HOST') or os.getenv('MQTT_BROKER', 'lo
 MQTT_BROKER_PORT = int(os.getenv('MQTT_BROKER_PORT') or os.getenv('MQTT_PORT', 1883))
 MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', 'iotlab_ingest')
 MQTT_KEEPALIVE = int(os.getenv('MQTT_KEEPALIVE', 60))
+MQTT_SHARED_GROUP = os.getenv('MQTT_SHARED_GROUP', '')
+MQTT_BATCH_SIZE = int(os.getenv('MQTT_BATCH_SIZE', 500))
+MQTT_FLUSH_INTERVAL = float(os.getenv('MQTT_FLUSH_INTERVAL', 0.05))
+MQTT_FLUSH_WORKERS = int(os.getenv('MQTT_FLUSH_WORKERS', 4))
+MQTT_MAX_BUFFERED = int(os.getenv('MQTT_MAX_BUFFERED', 10000))
+MQTT_RCVBUF = int(os.getenv('MQTT_RCVBUF', 4 * 1024 * 1024))
+MQTT_LAST_SEEN_INTERVAL = float(os.getenv('MQTT_LAST_SEEN_INTERVAL', 10))
 
 # Device Simulator Settings
 DEFAULT_DEVICE_COUNT = int(os.getenv('DEFAULT_DEVICE_COUNT', 10))
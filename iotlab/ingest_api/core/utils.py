@@ -0,0 +1,9 @@
+def bounded_int(value, default, lo, hi):
+    """
+    Parse a query parameter as an int clamped to [lo, hi], falling back to
+    default when it is missing or not a number.
+    """
+    try:
+        return max(lo, min(hi, int(value)))
+    except (TypeError, ValueError):
+        return default
@@ -14,9 +14,11 @@ class Command(BaseCommand):
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "temperature": {"type": "number", "minimum": -40, "maximum": 85},
-                        "humidity": {"type": "number", "minimum": 0, "maximum": 100},
-                        "battery": {"type": "number", "minimum": 0, "maximum": 100}
+                        "temperature": {"type": "number"},
+                        "humidity": {"type": "number"},
+                        "battery": {"type": "number"},
+                        "status": {"type": "string"},
+                        "error_code": {"type": "string"}
                     }
                 }
             },
@@ -26,9 +28,15 @@ class Command(BaseCommand):
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "velocity_rms": {"type": "number", "minimum": 0, "maximum": 50},
-                        "frequency": {"type": "number", "minimum": 0, "maximum": 1000},
-                        "temperature": {"type": "number", "minimum": -10, "maximum": 100}
+                        "acceleration_x": {"type": "number"},
+                        "acceleration_y": {"type": "number"},
+                        "acceleration_z": {"type": "number"},
+                        "velocity_rms": {"type": "number"},
+                        "frequency": {"type": "number"},
+                        "temperature": {"type": "number"},
+                        "machine_state": {"type": "string"},
+                        "machine_type": {"type": "string"},
+                        "error_code": {"type": "string"}
                     }
                 }
             },
@@ -38,28 +46,33 @@ class Command(BaseCommand):
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "flow_rate": {"type": "number", "minimum": 0, "maximum": 100},
-                        "pressure": {"type": "number", "minimum": 0, "maximum": 200},
-                        "temperature": {"type": "number", "minimum": 0, "maximum": 150}
+                        "flow_rate": {"type": "number"},
+                        "pressure": {"type": "number"},
+                        "temperature": {"type": "number"},
+                        "total_flow": {"type": "number"},
+                        "fluid_type": {"type": "string"},
+                        "status": {"type": "string"},
+                        "error_code": {"type": "string"}
                     }
                 }
             }
         ]
 
-        # Create device types
-        created_types = []
+        # Create the device types that don't exist yet in one INSERT
+        types_by_name = {
+            device_type.name: device_type
+            for device_type in DeviceType.objects.filter(name__in=[dt["name"] for dt in device_types])
+        }
+        new_types = [
+            DeviceType(name=dt["name"], description=dt["description"], schema=dt["schema"])
+            for dt in device_types if dt["name"] not in types_by_name
+        ]
+        DeviceType.objects.bulk_create(new_types)
         for dt in device_types:
-            device_type, created = DeviceType.objects.get_or_create(
-                name=dt["name"],
-                defaults={
-                    "description": dt["description"],
-                    "schema": dt["schema"]
-                }
-            )
-            created_types.append(device_type)
             self.stdout.write(
-                self.style.SUCCESS(f"{'Created' if created else 'Found'} device type: {device_type.name}")
+                self.style.SUCCESS(f"{'Found' if dt['name'] in types_by_name else 'Created'} device type: {dt['name']}")
             )
+        types_by_name.update((device_type.name, device_type) for device_type in new_types)
 
         # Create sample devices for each type
         sample_devices = [
@@ -75,23 +88,33 @@ class Command(BaseCommand):
             {"name": "Flow-002", "type": "Flow Meter", "status": "online"},
         ]
 
-        # Create devices
-        for dev in sample_devices:
-            device_type = DeviceType.objects.get(name=dev["type"])
-            device, created = Device.objects.get_or_create(
+        # Create the devices that don't exist yet in one INSERT
+        devices_by_name = {
+            device.name: device
+            for device in Device.objects.filter(name__in=[dev["name"] for dev in sample_devices])
+        }
+        now = timezone.now()
+        new_devices = [
+            Device(
                 name=dev["name"],
-                defaults={
-                    "device_type": device_type,
-                    "status": dev["status"],
-                    "last_seen": timezone.now() if dev["status"] == "online" else None,
-                    "metadata": {
-                        "location": "Factory Floor",
-                        "installation_date": timezone.now().isoformat()
-                    }
+                device_type=types_by_name[dev["type"]],
+                status=dev["status"],
+                last_seen=now if dev["status"] == "online" else None,
+                metadata={
+                    "location": "Factory Floor",
+                    "installation_date": now.isoformat()
                 }
             )
+            for dev in sample_devices if dev["name"] not in devices_by_name
+        ]
+        Device.objects.bulk_create(new_devices)
+        for device in new_devices:
+            self.stdout.write(
+                self.style.SUCCESS(f"Created device: {device.name} ({device.status})")
+            )
+        for device in devices_by_name.values():
             self.stdout.write(
-                self.style.SUCCESS(f"{'Created' if created else 'Found'} device: {device.name} ({device.status})")
+                self.style.SUCCESS(f"Found device: {device.name} ({device.status})")
             )
 
         # Print summary
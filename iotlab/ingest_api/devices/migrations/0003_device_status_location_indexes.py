@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:36
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("devices", "0002_alter_device_device_type"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="device",
+            index=models.Index(
+                fields=["status", "-last_seen"], name="devices_dev_status_63b8b6_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="device",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("location", "metadata"),
+                name="device_location_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models.fields.json import KeyTransform
 from django.utils import timezone
 
 class DeviceType(models.Model):
@@ -29,6 +30,13 @@ class Device(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     metadata = models.JSONField(default=dict, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-last_seen']),
+            # The device list filters on metadata__location
+            models.Index(KeyTransform('location', 'metadata'), name='device_location_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.device_type.name})"
 
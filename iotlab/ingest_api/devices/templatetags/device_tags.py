@@ -12,8 +12,6 @@ def multiply(value, arg):
 @register.filter
 def percentage(value, total):
     try:
-        if total > 0:
-            return (value / total) * 100
-        return 0
+        return value * 100 / total if total > 0 else 0
     except (ValueError, TypeError, ZeroDivisionError):
         return 0 
\ No newline at end of file
@@ -0,0 +1,37 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.views.decorators.http import etag
+
+from iotlab.ingest_api.devices.models import Device, DeviceConfig, DeviceType
+from v1.views import device_list_etag
+
+
+@etag(device_list_etag)
+def device_list(request):
+    return HttpResponse()
+
+
+class DeviceListETagTests(TestCase):
+    def setUp(self):
+        device_type = DeviceType.objects.create(name="Flow Meter", schema={})
+        self.configs = [
+            DeviceConfig.objects.create(
+                device=Device.objects.create(name=f"Flow-00{i}", device_type=device_type),
+                configuration={}
+            )
+            for i in range(2)
+        ]
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return device_list(RequestFactory().get("/api/v1/devices/", **headers))
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_removed_config_changes_the_etag(self):
+        etag = self.get()["ETag"]
+        # The older config, so the newest config__updated_at stays the same
+        self.configs[0].delete()
+        self.assertEqual(self.get(etag).status_code, 200)
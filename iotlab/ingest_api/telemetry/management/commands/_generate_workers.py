@@ -0,0 +1,37 @@
+"""
+Worker process entry points for generate_telemetry.
+
+These live apart from the command so that a worker started with spawn (the
+default outside Linux) can import them before Django is set up: models are
+only imported once _init_worker has run django.setup().
+"""
+import django
+from django.apps import apps
+from django.db import connections
+
+import numpy as np
+
+# Reading times shared by every device, set once in each worker process
+_worker_times = None
+
+
+def _init_worker(times, database_name):
+    global _worker_times
+    if not apps.ready:
+        django.setup()
+    # Forked workers must not reuse the parent's database connections
+    connections.close_all()
+    # Write to the parent's database, which isn't the configured one under the test runner
+    connections['default'].settings_dict['NAME'] = database_name
+    _worker_times = times
+
+
+def _generate_for_device(args):
+    from iotlab.ingest_api.devices.models import Device
+    from .generate_telemetry import Command
+
+    device_id, anomaly_probability, batch_size, seed = args
+    device = Device.objects.select_related('device_type').get(id=device_id)
+    rng = np.random.default_rng(seed)
+    counts = Command().generate_device(device, *_worker_times, anomaly_probability, batch_size, rng)
+    return (device.name, *counts)
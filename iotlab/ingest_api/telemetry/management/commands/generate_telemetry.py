@@ -1,14 +1,42 @@
 from django.core.management.base import BaseCommand
+from django.db import connections, transaction
 from django.utils import timezone
 from datetime import timedelta
-import random
+from multiprocessing import Pool
 import logging
 
+import numpy as np
+
 from iotlab.ingest_api.devices.models import Device
 from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
 
+from ._generate_workers import _init_worker, _generate_for_device
+
 logger = logging.getLogger(__name__)
 
+# Default rows per INSERT statement when writing generated readings
+BATCH_SIZE = 1000
+
+SEVERITY_CHOICES = ['low', 'medium', 'high', 'critical']
+SEVERITY_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+
+# Flow factor is 0.6 at 00:00-06:00, 1.2 at 06:00-09:00, 1.0 at 09:00-17:00, 1.1 at 17:00-22:00, 0.8 at 22:00-00:00
+FLOW_FACTORS = np.array([0.6] * 6 + [1.2] * 3 + [1.0] * 8 + [1.1] * 5 + [0.8] * 2)
+
+# Device type name -> (generator method, range of the device's base value)
+GENERATORS = {
+    'Temperature Sensor': ('generate_temperature_data', (19.0, 22.0)),  # Base temperature
+    'Vibration Sensor': ('generate_vibration_data', (20.0, 60.0)),  # Base frequency
+    'Flow Meter': ('generate_flow_data', (40.0, 60.0)),  # Base flow rate / pressure
+}
+
+# Device type name -> anomaly method
+ANOMALY_RULES = {
+    'Temperature Sensor': 'temperature_anomaly',
+    'Vibration Sensor': 'vibration_anomaly',
+    'Flow Meter': 'flow_anomaly',
+}
+
 class Command(BaseCommand):
     help = 'Generates historical telemetry (and anomalies) for existing online devices'
 
@@ -36,23 +64,45 @@ class Command(BaseCommand):
             default=0.05,
             help='Probability of generating an anomaly for each reading (default: 0.05)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of rows per INSERT statement (default: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, to generate the same data on every run (optional)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes generating devices in parallel (default: 1)'
+        )
 
     def handle(self, *args, **options):
         days = options['days']
         readings_per_day = options['readings_per_day']
         device_id = options.get('device_id')
         anomaly_probability = options['anomaly_probability']
+        batch_size = options['batch_size']
 
         # Get devices to generate data for
         if device_id:
             devices = Device.objects.filter(id=device_id, status='online')
-            if not devices.exists():
-                self.stderr.write(f"Online device with ID {device_id} not found")
-                return
         else:
             devices = Device.objects.filter(status='online')
+        # Only device types we know how to generate data for
+        devices = devices.filter(device_type__name__in=GENERATORS.keys()).select_related('device_type').order_by('id')
 
-        if not devices.exists():
+        device_count = devices.count()
+        if device_id and not device_count:
+            self.stderr.write(f"Online device with ID {device_id} not found")
+            return
+
+        if not device_count:
             self.stderr.write(
                 self.style.ERROR('No online devices found. Please run seed_devices first.')
             )
@@ -62,186 +112,202 @@ class Command(BaseCommand):
         start_date = end_date - timedelta(days=days)
         interval = timedelta(days=1) / readings_per_day
 
-        self.stdout.write(f"Generating {days} days of data for {devices.count()} devices...")
+        self.stdout.write(f"Generating {days} days of data for {device_count} devices...")
+
+        # One independent seed per device, so the data doesn't depend on --workers
+        seeds = np.random.SeedSequence(options.get('seed')).spawn(device_count)
+
+        # Reading times are the same for every device, so compute them once
+        times = self.reading_times(start_date, end_date, interval)
 
         total_readings = 0
         total_anomalies = 0
 
-        for device in devices:
-            current_time = start_date
-            readings_count = 0
-            anomalies_count = 0
-
-            # Set base values for the device
-            if device.device_type.name == 'Temperature Sensor':
-                base_value = random.uniform(19.0, 22.0) # Base temperature
-            elif device.device_type.name == 'Vibration Sensor':
-                base_value = random.uniform(20.0, 60.0) # Base frequency
-            elif device.device_type.name == 'Flow Meter':
-                base_value = random.uniform(40.0, 60.0) # Base flow rate / pressure
-            else:
-                continue
-
-            while current_time <= end_date:
-                # Generate telemetry data based on device type
-                if device.device_type.name == 'Temperature Sensor':
-                    data = self.generate_temperature_data(base_value, current_time)
-                elif device.device_type.name == 'Vibration Sensor':
-                    data = self.generate_vibration_data(base_value, current_time)
-                elif device.device_type.name == 'Flow Meter':
-                    data = self.generate_flow_data(base_value, current_time)
-                else:
-                    continue
-                # Create telemetry record
-                telemetry = Telemetry.objects.create(
-                    device=device,
-                    timestamp=current_time,
-                    data=data
-                )
-                readings_count += 1
-
-                # Generate anomaly if probability is met
-                if random.random() < anomaly_probability:
-                    anomaly = self.generate_anomaly(device, telemetry, data)
-                    if anomaly:
-                        anomalies_count += 1
-
-                current_time += interval
-
-            total_readings += readings_count
-            total_anomalies += anomalies_count
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Generated {readings_count} readings and {anomalies_count} anomalies for {device.name}"
-                )
+        pool = None
+        if options['workers'] > 1 and device_count > 1:
+            # Devices are independent, so split them across worker processes
+            tasks = [
+                (device_id, anomaly_probability, batch_size, seed)
+                for device_id, seed in zip(devices.values_list('id', flat=True), seeds)
+            ]
+            database_name = connections['default'].settings_dict['NAME']
+            connections.close_all()
+            pool = Pool(min(options['workers'], device_count), _init_worker, (times, database_name))
+            results = pool.imap_unordered(_generate_for_device, tasks)
+        else:
+            # Stream devices rather than loading the whole queryset up front
+            results = (
+                (device.name, *self.generate_device(
+                    device, *times, anomaly_probability, batch_size, np.random.default_rng(seed)
+                ))
+                for device, seed in zip(devices.iterator(chunk_size=100), seeds)
             )
 
+        try:
+            for name, readings_count, anomalies_count in results:
+                total_readings += readings_count
+                total_anomalies += anomalies_count
+
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Generated {readings_count} readings and {anomalies_count} anomalies for {name}"
+                    )
+                )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
         self.stdout.write(
             self.style.SUCCESS(
-                f"\nTotal: {total_readings} readings and {total_anomalies} anomalies across {devices.count()} devices"
+                f"\nTotal: {total_readings} readings and {total_anomalies} anomalies across {device_count} devices"
             )
         )
 
-    def generate_temperature_data(self, base_temp, timestamp):
+    def generate_device(self, device, timestamps, hours, month_days, anomaly_probability, batch_size, rng):
+        """Generate and save one device's readings; returns the number of readings and anomalies."""
+        type_name = device.device_type.name
+        generator_name, (low, high) = GENERATORS[type_name]
+        anomaly_rule = getattr(self, ANOMALY_RULES[type_name])
+
+        # Set base value for the device and generate all of its readings
+        base_value = rng.uniform(low, high)
+        columns = getattr(self, generator_name)(base_value, hours, month_days, rng)
+        readings = self.to_rows(columns)
+
+        # Pick the readings that become anomalies; this may adjust their
+        # data in place, so it runs before the telemetry rows are built
+        hits = np.flatnonzero(rng.random(len(readings)) < anomaly_probability)
+        severities = rng.choice(SEVERITY_CHOICES, size=len(hits), p=SEVERITY_WEIGHTS)
+        anomaly_objs = []
+        for i, severity in zip(hits.tolist(), severities.tolist()):
+            anomaly_objs.append(
+                self.generate_anomaly(device, anomaly_rule, readings[i], timestamps[i], severity, rng)
+            )
+
+        telemetry_objs = [
+            Telemetry(device=device, timestamp=timestamp, data=data)
+            for timestamp, data in zip(timestamps, readings)
+        ]
+
+        # Insert this device's rows in a few multi-row INSERTs
+        with transaction.atomic():
+            Telemetry.objects.bulk_create(telemetry_objs, batch_size=batch_size)
+            AnomalyDetection.objects.bulk_create(anomaly_objs, batch_size=batch_size)
+        return len(telemetry_objs), len(anomaly_objs)
+
+    def reading_times(self, start_date, end_date, interval):
+        """
+        Reading timestamps from start_date to end_date (inclusive), spaced by
+        interval, along with the UTC hour and day of month of each one.
+        """
+        n = (end_date - start_date) // interval + 1
+        offsets = np.arange(n, dtype=np.int64) * (interval // timedelta(microseconds=1))
+        times = np.datetime64(start_date.replace(tzinfo=None), 'us') + offsets.astype('timedelta64[us]')
+
+        days = times.astype('datetime64[D]')
+        hours = (times.astype('datetime64[h]') - days).astype(np.int64)
+        month_days = (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+
+        timestamps = [start_date + interval * i for i in range(n)]
+        return timestamps, hours, month_days
+
+    def to_rows(self, columns):
+        """Turn a dict of per-field arrays into per-reading dicts."""
+        names = list(columns)
+        values = [col.tolist() for col in columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def generate_temperature_data(self, base_temp, hours, month_days, rng):
         # Generate temperature data based on time of day
-        hour = timestamp.hour
+        n = len(hours)
         # Time factor is 0 at 14:00 and 1 at 00:00 and 24:00
-        time_factor = abs(hour - 14) / 14.0
+        time_factor = np.abs(hours - 14) / 14.0
         daily_temp = base_temp - (time_factor * 5) # Daily temperature variation of 5C
         # Add random noise to the temperature
-        temp = daily_temp + random.uniform(-0.5, 0.5)
+        temp = daily_temp + rng.uniform(-0.5, 0.5, n)
 
         humidity = 100 - (temp - 10) * 2
-        humidity = max(30, min(95, humidity))
+        np.clip(humidity, 30, 95, out=humidity)
     
-        battery = 100 - (timestamp.day % 30) * 3
+        battery = 100 - (month_days % 30) * 3
         return {
-            "temperature": round(temp, 2),
-            "humidity": round(humidity, 2),
-            "battery": round(battery, 2),
-            "status": "normal"
+            "temperature": np.round(temp, 2, out=temp),
+            "humidity": np.round(humidity, 2, out=humidity),
+            "battery": battery
         }
 
-    def generate_vibration_data(self, base_freq, timestamp):
+    def generate_vibration_data(self, base_freq, hours, month_days, rng):
         # Generate vibration data based on time of day
-        hour = timestamp.hour
-        if 8 <= hour <= 18:
-            freq_factor = 1.0
-            velocity_factor = 1.0
-        else:
-            freq_factor = 0.7
-            velocity_factor = 0.6
-        frequency = base_freq * freq_factor + random.uniform(-2, 2)
-        velocity = 2.5 * velocity_factor + random.uniform(-0.2, 0.2)
-        temp = 35 + (velocity * 2) + random.uniform(-0.5, 0.5)
+        n = len(hours)
+        working_hours = (hours >= 8) & (hours <= 18)
+        freq_factor = np.where(working_hours, 1.0, 0.7)
+        velocity_factor = np.where(working_hours, 1.0, 0.6)
+        # Noise for frequency, velocity and temperature, in one draw
+        noise = rng.uniform([-2, -0.2, -0.5], [2, 0.2, 0.5], (n, 3))
+        frequency = base_freq * freq_factor + noise[:, 0]
+        velocity = 2.5 * velocity_factor + noise[:, 1]
+        temp = 35 + (velocity * 2) + noise[:, 2]
         return {
-            "velocity_rms": round(velocity, 3),
-            "frequency": round(frequency, 2),
-            "temperature": round(temp, 2),
-            "machine_state": "on"
+            "velocity_rms": np.round(velocity, 3, out=velocity),
+            "frequency": np.round(frequency, 2, out=frequency),
+            "temperature": np.round(temp, 2, out=temp)
         }
 
-    def generate_flow_data(self, base_flow, timestamp):
+    def generate_flow_data(self, base_flow, hours, month_days, rng):
         # Generate flow data based on time of day
-        hour = timestamp.hour
-        # Flow factor is 0.6 at 00:00-06:00, 1.2 at 06:00-09:00, 1.0 at 09:00-17:00, 1.1 at 17:00-22:00, 0.8 at 22:00-00:00
-        if hour < 6:
-            flow_factor = 0.6
-        elif hour < 9:
-            flow_factor = 1.2
-        elif hour < 17:
-            flow_factor = 1.0
-        elif hour < 22:
-            flow_factor = 1.1
-        else:
-            flow_factor = 0.8
-        flow_rate = base_flow * flow_factor + random.uniform(-2, 2)
-        pressure = 5.0 - (0.05 * flow_rate) + random.uniform(-0.1, 0.1)
-        temp = 25 + (flow_rate * 0.1) + random.uniform(-0.5, 0.5)
+        n = len(hours)
+        # Noise for flow rate, pressure and temperature, in one draw
+        noise = rng.uniform([-2, -0.1, -0.5], [2, 0.1, 0.5], (n, 3))
+        flow_rate = base_flow * FLOW_FACTORS[hours] + noise[:, 0]
+        pressure = 5.0 - (0.05 * flow_rate) + noise[:, 1]
+        temp = 25 + (flow_rate * 0.1) + noise[:, 2]
         return {
-            "flow_rate": round(flow_rate, 2),
-            "pressure": round(pressure, 2),
-            "temperature": round(temp, 2),
-            "status": "normal"
+            "flow_rate": np.round(flow_rate, 2, out=flow_rate),
+            "pressure": np.round(pressure, 2, out=pressure),
+            "temperature": np.round(temp, 2, out=temp)
         }
 
-    def generate_anomaly(self, device, telemetry, data):
-        # Generate anomaly based on device type and data
-        severity_choices = ['low', 'medium', 'high', 'critical']
-        severity_weights = [0.4, 0.3, 0.2, 0.1]
-        severity = random.choices(severity_choices, weights=severity_weights)[0]
-        anomaly_data = {}
-        description = ""
-
-        if device.device_type.name == 'Temperature Sensor':
-            # Generate anomaly for temperature if probability is met
-            if random.random() < 0.7: 
-                # Threshold is 30C for high and critical severity, 28C for medium severity
-                threshold = 30 if severity in ['high', 'critical'] else 28
-                if data['temperature'] < threshold:
-                    data['temperature'] += random.uniform(5, 15)
-                description = "High temperature detected"
-                anomaly_data = {"threshold": threshold, "value": data['temperature']}
-            else:
-                # Threshold is 85C for high and critical severity, 80C for medium severity
-                threshold = 85 if severity in ['high', 'critical'] else 80
-                if data['humidity'] < threshold:
-                    data['humidity'] += random.uniform(10, 20)
-                description = "High humidity detected"
-                anomaly_data = {"threshold": threshold, "value": data['humidity']}
-
-        elif device.device_type.name == 'Vibration Sensor':
-            # Threshold is 7 for high and critical severity, 5 for medium severity
-            threshold = 7 if severity in ['high', 'critical'] else 5
-            if data['velocity_rms'] < threshold:
-                data['velocity_rms'] *= random.uniform(2.0, 3.0)
-            description = "High vibration detected"
-            anomaly_data = {"threshold": threshold, "value": data['velocity_rms']}
-
-        elif device.device_type.name == 'Flow Meter':
-            
-            if random.random() < 0.6:
-                threshold = 8 if severity in ['high', 'critical'] else 6
-                if data['pressure'] < threshold:
-                    data['pressure'] *= random.uniform(1.5, 2.0)
-                description = "High pressure detected"
-                anomaly_data = {"threshold": threshold, "value": data['pressure']}
-            else:
-                threshold = data['flow_rate'] * 1.5
-                data['flow_rate'] *= random.uniform(1.5, 2.0)
-                description = "Abnormal flow rate detected"
-                anomaly_data = {"threshold": threshold, "value": data['flow_rate']}
-
-        if description and anomaly_data:
-            telemetry.data = data
-            telemetry.save()
-            return AnomalyDetection.objects.create(
-                device=device,
-                severity=severity,
-                description=description,
-                data=anomaly_data,
-                timestamp=telemetry.timestamp
-            )
-        return None
+    def generate_anomaly(self, device, anomaly_rule, data, timestamp, severity, rng):
+        """Build an unsaved AnomalyDetection for a reading, adjusting data to match."""
+        description, anomaly_data = anomaly_rule(data, severity, rng)
+        return AnomalyDetection(
+            device=device,
+            severity=severity,
+            description=description,
+            data=anomaly_data,
+            timestamp=timestamp
+        )
+
+    def temperature_anomaly(self, data, severity, rng):
+        # Generate anomaly for temperature if probability is met
+        if rng.random() < 0.7: 
+            # Threshold is 30C for high and critical severity, 28C for medium severity
+            threshold = 30 if severity in ['high', 'critical'] else 28
+            if data['temperature'] < threshold:
+                data['temperature'] += rng.uniform(5, 15)
+            return "High temperature detected", {"threshold": threshold, "value": data['temperature']}
+
+        # Threshold is 85C for high and critical severity, 80C for medium severity
+        threshold = 85 if severity in ['high', 'critical'] else 80
+        if data['humidity'] < threshold:
+            data['humidity'] += rng.uniform(10, 20)
+        return "High humidity detected", {"threshold": threshold, "value": data['humidity']}
+
+    def vibration_anomaly(self, data, severity, rng):
+        # Threshold is 7 for high and critical severity, 5 for medium severity
+        threshold = 7 if severity in ['high', 'critical'] else 5
+        if data['velocity_rms'] < threshold:
+            data['velocity_rms'] *= rng.uniform(2.0, 3.0)
+        return "High vibration detected", {"threshold": threshold, "value": data['velocity_rms']}
+
+    def flow_anomaly(self, data, severity, rng):
+        if rng.random() < 0.6:
+            threshold = 8 if severity in ['high', 'critical'] else 6
+            if data['pressure'] < threshold:
+                data['pressure'] *= rng.uniform(1.5, 2.0)
+            return "High pressure detected", {"threshold": threshold, "value": data['pressure']}
 
+        threshold = data['flow_rate'] * 1.5
+        data['flow_rate'] *= rng.uniform(1.5, 2.0)
+        return "Abnormal flow rate detected", {"threshold": threshold, "value": data['flow_rate']}
@@ -1,5 +1,6 @@
-import time
+import signal
 import logging
+import threading
 from django.core.management.base import BaseCommand
 from iotlab.ingest_api.telemetry.mqtt_client import mqtt_client
 
@@ -18,14 +19,15 @@ class Command(BaseCommand):
             
             self.stdout.write(self.style.SUCCESS('MQTT client started successfully'))
             
-            # Keep the command running
-            try:
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                self.stdout.write(self.style.WARNING('Stopping MQTT client...'))
-                mqtt_client.disconnect()
-                self.stdout.write(self.style.SUCCESS('MQTT client stopped'))
+            # Keep the command running until SIGINT or SIGTERM
+            stop = threading.Event()
+            signal.signal(signal.SIGINT, lambda *args: stop.set())
+            signal.signal(signal.SIGTERM, lambda *args: stop.set())
+            stop.wait()
+            
+            self.stdout.write(self.style.WARNING('Stopping MQTT client...'))
+            mqtt_client.disconnect()
+            self.stdout.write(self.style.SUCCESS('MQTT client stopped'))
                 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error starting MQTT client: {e}'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-14 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("devices", "0002_alter_device_device_type"),
+        ("telemetry", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="anomalydetection",
+            name="timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="anomalydetection",
+            index=models.Index(
+                fields=["device", "-timestamp"], name="telemetry_a_device__1172a3_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("telemetry", "0002_alter_anomalydetection_timestamp_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="anomalydetection",
+            name="acknowledged",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name="anomalydetection",
+            name="acknowledged_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
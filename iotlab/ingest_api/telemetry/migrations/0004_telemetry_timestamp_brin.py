@@ -0,0 +1,24 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:26
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("devices", "0002_alter_device_device_type"),
+        ("telemetry", "0003_anomalydetection_acknowledged_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="telemetry",
+            name="telemetry_t_timesta_e8cd0f_idx",
+        ),
+        migrations.AddIndex(
+            model_name="telemetry",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["timestamp"], name="telemetry_ts_brin", pages_per_range=32
+            ),
+        ),
+    ]
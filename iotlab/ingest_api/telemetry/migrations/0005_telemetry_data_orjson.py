@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:26
+
+import iotlab.ingest_api.telemetry.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("telemetry", "0004_telemetry_timestamp_brin"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="telemetry",
+            name="data",
+            field=models.JSONField(
+                decoder=iotlab.ingest_api.telemetry.models.OrjsonDecoder,
+                encoder=iotlab.ingest_api.telemetry.models.OrjsonEncoder,
+            ),
+        ),
+    ]
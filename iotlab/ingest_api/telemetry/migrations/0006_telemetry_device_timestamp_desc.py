@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("devices", "0002_alter_device_device_type"),
+        ("telemetry", "0005_telemetry_data_orjson"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="telemetry",
+            index=models.Index(
+                fields=["device", "-timestamp"], name="telemetry_t_device__4281cd_idx"
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="telemetry",
+            name="telemetry_t_device__68496d_idx",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-14 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("devices", "0003_device_status_location_indexes"),
+        ("telemetry", "0006_telemetry_device_timestamp_desc"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="anomalydetection",
+            index=models.Index(
+                fields=["severity", "-timestamp"], name="telemetry_a_severit_b48b98_idx"
+            ),
+        ),
+    ]
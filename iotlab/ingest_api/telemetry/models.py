@@ -1,18 +1,35 @@
+import json
+import orjson
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 from django.utils import timezone
 from iotlab.ingest_api.devices.models import Device
 
+class OrjsonEncoder(json.JSONEncoder):
+    """JSONField encoder that serializes with orjson."""
+
+    def encode(self, o):
+        return orjson.dumps(o).decode()
+
+class OrjsonDecoder(json.JSONDecoder):
+    """JSONField decoder that parses with orjson."""
+
+    def decode(self, s):
+        return orjson.loads(s)
+
 class Telemetry(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(default=timezone.now)
-    data = models.JSONField()
+    data = models.JSONField(encoder=OrjsonEncoder, decoder=OrjsonDecoder)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name_plural = "Telemetry"
         indexes = [
-            models.Index(fields=['device', 'timestamp']),
-            models.Index(fields=['timestamp']),
+            models.Index(fields=['device', '-timestamp']),
+            # Rows arrive in time order, so a BRIN index covers time-range
+            # scans at a fraction of a B-tree's size and insert cost
+            BrinIndex(fields=['timestamp'], name='telemetry_ts_brin', pages_per_range=32),
         ]
 
     def __str__(self):
@@ -27,18 +44,31 @@ class AnomalyDetection(models.Model):
     ]
 
     device = models.ForeignKey(Device, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(default=timezone.now)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
     description = models.TextField()
     data = models.JSONField()
     resolved = models.BooleanField(default=False)
     resolved_at = models.DateTimeField(null=True, blank=True)
+    acknowledged = models.BooleanField(default=False, db_index=True)
+    acknowledged_at = models.DateTimeField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['device', '-timestamp']),
+            models.Index(fields=['severity', '-timestamp']),
+        ]
+
     def __str__(self):
         return f"Anomaly for {self.device.name} at {self.timestamp}"
 
     def resolve(self):
         self.resolved = True
         self.resolved_at = timezone.now()
-        self.save(update_fields=['resolved', 'resolved_at']) 
\ No newline at end of file
+        self.save(update_fields=['resolved', 'resolved_at'])
+
+    @classmethod
+    def resolve_queryset(cls, queryset):
+        # One UPDATE for the whole queryset; already-resolved rows keep their resolved_at
+        return queryset.filter(resolved=False).update(resolved=True, resolved_at=timezone.now()) 
\ No newline at end of file
@@ -1,28 +1,160 @@
-import json
+import os
+import time
 import uuid
+import socket
+import asyncio
 import logging
+import threading
+import collections
+import concurrent.futures
+import orjson
+import ciso8601
+import fastjsonschema
 import paho.mqtt.client as mqtt
 from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from django.core.serializers.json import DjangoJSONEncoder
 
-from iotlab.ingest_api.devices.models import Device
+from iotlab.ingest_api.devices.models import Device, DeviceType
 from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
 
 logger = logging.getLogger(__name__)
 channel_layer = get_channel_layer()
 
+# Devices recently resolved from telemetry topics: device_id -> (device, expiry)
+DEVICE_CACHE_SIZE = 4096
+DEVICE_CACHE_TTL = 60
+_device_cache = {}
+
+# Guards _device_cache and _validators, which every flusher thread shares
+_cache_lock = threading.Lock()
+
+
+def get_devices(device_ids):
+    """Map device IDs to Device objects (id, name and type only), using the cache where possible."""
+    now = time.monotonic()
+    devices = {}
+    missing = []
+    with _cache_lock:
+        for device_id in device_ids:
+            entry = _device_cache.get(device_id)
+            if entry and entry[1] > now:
+                devices[device_id] = entry[0]
+            else:
+                missing.append(device_id)
+    
+    if missing:
+        fetched = Device.objects.only('id', 'name', 'device_type').in_bulk(missing)
+        expiry = now + DEVICE_CACHE_TTL
+        with _cache_lock:
+            if len(_device_cache) + len(fetched) > DEVICE_CACHE_SIZE:
+                _device_cache.clear()
+            for device_id, device in fetched.items():
+                _device_cache[device_id] = (device, expiry)
+        devices.update(fetched)
+    
+    return devices
+
+
+@receiver([post_save, post_delete], sender=Device)
+def invalidate_device_cache(sender, instance, **kwargs):
+    """Drop a changed or deleted device from the cache."""
+    with _cache_lock:
+        _device_cache.pop(instance.pk, None)
+
+
+# Anomaly severities the AnomalyDetection table accepts
+SEVERITIES = frozenset(severity for severity, _ in AnomalyDetection.SEVERITY_CHOICES)
+
+
+def valid_anomalies(anomalies):
+    """Return whether anomalies is a list of records process_anomalies can save."""
+    return isinstance(anomalies, list) and all(
+        isinstance(anomaly, dict)
+        and anomaly.get('severity', 'medium') in SEVERITIES
+        and isinstance(anomaly.get('description', ''), str)
+        for anomaly in anomalies
+    )
+
+
+# Compiled telemetry validators for each DeviceType.schema: device_type_id -> validate
+_validators = {}
+
+# Range keywords left out of validation: anomalies are out-of-range readings
+# by design, and they must still be stored
+RANGE_KEYWORDS = frozenset({'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum'})
+
+
+def structural_schema(schema):
+    """A copy of a JSON schema that only checks structure (keys and types), not value ranges."""
+    if isinstance(schema, dict):
+        return {key: structural_schema(value) for key, value in schema.items() if key not in RANGE_KEYWORDS}
+    if isinstance(schema, list):
+        return [structural_schema(value) for value in schema]
+    return schema
+
+
+def get_validator(device_type_id):
+    """Compiled validator for a device type's telemetry schema."""
+    with _cache_lock:
+        validate = _validators.get(device_type_id)
+    if validate is None:
+        schema = DeviceType.objects.filter(id=device_type_id).values_list('schema', flat=True).first()
+        try:
+            validate = fastjsonschema.compile(structural_schema(schema or {}))
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            logger.error(f"Invalid schema for device type {device_type_id}, not validating its telemetry: {e}")
+            validate = fastjsonschema.compile({})
+        with _cache_lock:
+            _validators[device_type_id] = validate
+    return validate
+
+
+@receiver([post_save, post_delete], sender=DeviceType)
+def invalidate_validator(sender, instance, **kwargs):
+    """Recompile a device type's validator after its schema changes."""
+    with _cache_lock:
+        _validators.pop(instance.pk, None)
+
 
 class MQTTClient:
     """MQTT Client for receiving telemetry data from IoT devices."""
     
     def __init__(self):
-        self.client = mqtt.Client(client_id=settings.MQTT_CLIENT_ID)
+        # Ingest processes sharing a subscription each need their own client ID
+        client_id = settings.MQTT_CLIENT_ID
+        if settings.MQTT_SHARED_GROUP:
+            client_id = f"{client_id}-{os.getpid()}"
+        
+        self.client = mqtt.Client(client_id=client_id)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_socket_open = self.on_socket_open
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        
+        # Telemetry waiting to be written: one (buffer, full event) shard per
+        # flusher thread. Each device always maps to the same shard, so its
+        # readings are written in arrival order by a single thread.
+        self._shards = [
+            (collections.deque(), threading.Event())
+            for _ in range(max(1, settings.MQTT_FLUSH_WORKERS))
+        ]
+        self._flushing = False
+        self._flushers = []
+        self.dropped = 0
+        
+        # When each device's last_seen was last written: device_id -> monotonic time.
+        # A device's key is only ever touched by the flusher thread of its shard.
+        self._last_seen_written = {}
+        
+        # Event loop thread that sends WebSocket broadcasts to the channel layer
+        self._loop = None
+        self._loop_thread = None
+        self._broadcasts = set()
         
         # Configure logger
         self.logger = logging.getLogger(__name__)
@@ -36,6 +168,8 @@ class MQTTClient:
                 settings.MQTT_KEEPALIVE
             )
             self.client.loop_start()
+            self._start_broadcaster()
+            self._start_flusher()
             self.logger.info(f"Connected to MQTT broker at {settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}")
         except Exception as e:
             self.logger.error(f"Failed to connect to MQTT broker: {e}")
@@ -44,15 +178,102 @@ class MQTTClient:
         """Disconnect from the MQTT broker."""
         self.client.loop_stop()
         self.client.disconnect()
+        self._stop_flusher()
+        self._stop_broadcaster()
         self.logger.info("Disconnected from MQTT broker")
     
+    def _start_broadcaster(self):
+        """Start the event loop thread that WebSocket broadcasts run on."""
+        if self._loop_thread and self._loop_thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+    
+    def _stop_broadcaster(self, timeout=5):
+        """Stop the broadcast event loop once pending broadcasts are sent."""
+        if not self._loop_thread:
+            return
+        concurrent.futures.wait(list(self._broadcasts), timeout=timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self._loop = None
+        self._loop_thread = None
+    
+    def _start_flusher(self):
+        """Start the threads that write buffered telemetry to the database."""
+        if any(flusher.is_alive() for flusher in self._flushers):
+            return
+        self._flushing = True
+        self._flushers = [
+            threading.Thread(target=self._flush_loop, args=shard, daemon=True)
+            for shard in self._shards
+        ]
+        for flusher in self._flushers:
+            flusher.start()
+    
+    def _stop_flusher(self):
+        """Stop the flusher threads once everything buffered has been written."""
+        if not self._flushers:
+            return
+        self._flushing = False
+        for _, buffer_full in self._shards:
+            buffer_full.set()
+        for flusher in self._flushers:
+            flusher.join()
+        self._flushers = []
+    
+    def _flush_loop(self, buffer, buffer_full):
+        """
+        Thread function writing one shard's buffered telemetry every batch or interval.
+        
+        Each flusher thread gets its own Django database connection, so
+        batches from several shards are written concurrently.
+        """
+        batch_size = settings.MQTT_BATCH_SIZE
+        while self._flushing or buffer:
+            # Wait for a full batch, but never hold readings longer than the interval
+            if len(buffer) < batch_size:
+                buffer_full.wait(settings.MQTT_FLUSH_INTERVAL)
+            buffer_full.clear()
+            
+            batch = []
+            try:
+                while len(batch) < batch_size:
+                    batch.append(buffer.popleft())
+            except IndexError:
+                pass
+            if not batch:
+                continue
+            
+            try:
+                self.flush_telemetry(batch)
+            except Exception as e:
+                self.logger.error(f"Error saving telemetry batch of {len(batch)} readings: {e}")
+            finally:
+                close_old_connections()
+        
+        connections.close_all()
+    
+    def on_socket_open(self, client, userdata, sock):
+        """Callback when the broker socket opens; enlarge its receive buffer."""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, settings.MQTT_RCVBUF)
+        except (AttributeError, OSError) as e:
+            self.logger.warning(f"Could not set MQTT socket receive buffer: {e}")
+    
     def on_connect(self, client, userdata, flags, rc):
         """Callback when connected to the MQTT broker."""
         if rc == 0:
             self.logger.info("Successfully connected to MQTT broker")
-            # Subscribe to all device telemetry topics
-            client.subscribe("telemetry/#")
-            self.logger.info("Subscribed to telemetry/# topic")
+            # Subscribe to all device telemetry topics, sharing them with the
+            # other ingest processes in the group if one is configured
+            topic = "telemetry/#"
+            if settings.MQTT_SHARED_GROUP:
+                topic = f"$share/{settings.MQTT_SHARED_GROUP}/{topic}"
+            client.subscribe(topic, qos=0)
+            self.logger.info(f"Subscribed to {topic} topic")
         else:
             self.logger.error(f"Failed to connect to MQTT broker with code {rc}")
     
@@ -71,149 +292,194 @@ class MQTTClient:
         try:
             # Parse the topic to get device ID
             # Expected format: telemetry/{device_id}
-            topic_parts = msg.topic.split('/')
-            if len(topic_parts) < 2:
-                self.logger.warning(f"Invalid topic format: {msg.topic}")
+            topic = msg.topic
+            prefix, _, device_id = topic.partition('/')
+            if prefix != 'telemetry' or not device_id:
+                self.logger.warning(f"Invalid topic format: {topic}")
                 return
             
-            device_id = topic_parts[1]
-            
-            # Decode payload
-            payload = json.loads(msg.payload.decode('utf-8'))
+            # Decode payload (orjson parses the raw bytes directly)
+            payload = orjson.loads(msg.payload)
             
             # Process the telemetry data
             self.process_telemetry(device_id, payload)
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             self.logger.error(f"Invalid JSON payload: {msg.payload}")
         except Exception as e:
             self.logger.error(f"Error processing MQTT message: {e}")
     
     def process_telemetry(self, device_id, payload):
-        """Process telemetry data from a device."""
+        """Queue telemetry data from a device to be saved with the next batch."""
         try:
-            # Get the device from the database
             try:
-                device = Device.objects.get(id=device_id)
-            except Device.DoesNotExist:
-                self.logger.warning(f"Device not found: {device_id}")
+                device_id = uuid.UUID(device_id)
+            except ValueError:
+                self.logger.warning(f"Invalid device ID: {device_id}")
                 return
             
             # Extract timestamp from payload or use current time
-            timestamp = payload.get('timestamp', timezone.now().isoformat())
-            if isinstance(timestamp, str):
-                timestamp = timezone.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            timestamp = payload.get('timestamp')
+            timestamp = ciso8601.parse_datetime(timestamp) if isinstance(timestamp, str) else timezone.now()
+            
+            # A malformed anomaly would fail the bulk insert for the whole batch
+            anomalies = payload.get('anomalies')
+            if anomalies is not None and not valid_anomalies(anomalies):
+                self.logger.warning(f"Invalid anomalies from device {device_id}")
+                return
+            
+            buffer, buffer_full = self._shards[hash(device_id) % len(self._shards)]
             
-            # Create telemetry entry
-            telemetry = Telemetry.objects.create(
+            # Shed load rather than grow without bound if the database falls behind
+            if len(buffer) >= settings.MQTT_MAX_BUFFERED // len(self._shards):
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    self.logger.warning(f"Telemetry buffer full, dropped {self.dropped} readings so far")
+                return
+            
+            buffer.append((device_id, timestamp, payload))
+            if len(buffer) >= settings.MQTT_BATCH_SIZE:
+                buffer_full.set()
+            
+        except Exception as e:
+            self.logger.error(f"Error queuing telemetry data: {e}")
+    
+    def flush_telemetry(self, batch):
+        """Save a batch of queued telemetry and broadcast it."""
+        devices = get_devices({device_id for device_id, _, _ in batch})
+        
+        telemetry_objs = []
+        anomaly_objs = []
+        for device_id, timestamp, payload in batch:
+            device = devices.get(device_id)
+            if not device:
+                self.logger.warning(f"Device not found: {device_id}")
+                continue
+            
+            data = payload.get('data', {})
+            try:
+                get_validator(device.device_type_id)(data)
+            except fastjsonschema.JsonSchemaException as e:
+                self.logger.warning(f"Invalid telemetry from device {device_id}: {e.message}")
+                continue
+            
+            telemetry = Telemetry(
                 device=device,
                 timestamp=timestamp,
-                data=payload.get('data', {})
+                data=data
             )
-            
-            # Update device last_seen
-            device.last_seen = timezone.now()
-            device.save(update_fields=['last_seen'])
+            telemetry_objs.append(telemetry)
             
             # Check for anomalies if data contains any
             if 'anomalies' in payload and payload['anomalies']:
-                self.process_anomalies(device, telemetry, payload['anomalies'])
-            
-            # Broadcast to WebSocket
-            self.broadcast_telemetry(device, telemetry)
-            
-            self.logger.debug(f"Processed telemetry from device {device_id}")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving telemetry data: {e}")
+                anomaly_objs.extend(self.process_anomalies(device, telemetry, payload['anomalies']))
+        
+        if not telemetry_objs:
+            return
+        
+        # Only refresh last_seen for devices not touched in the last interval
+        now = time.monotonic()
+        interval = settings.MQTT_LAST_SEEN_INTERVAL
+        stale_ids = {
+            telemetry.device_id for telemetry in telemetry_objs
+            if now - self._last_seen_written.get(telemetry.device_id, -interval) >= interval
+        }
+        
+        # One multi-row INSERT per table and at most one last_seen UPDATE for the batch
+        with transaction.atomic():
+            Telemetry.objects.bulk_create(telemetry_objs, batch_size=settings.MQTT_BATCH_SIZE)
+            AnomalyDetection.objects.bulk_create(anomaly_objs, batch_size=settings.MQTT_BATCH_SIZE)
+            if stale_ids:
+                Device.objects.filter(id__in=stale_ids).update(last_seen=timezone.now())
+        for device_id in stale_ids:
+            self._last_seen_written[device_id] = now
+        
+        # Broadcast the whole batch to WebSocket
+        messages = []
+        for telemetry in telemetry_objs:
+            messages.extend(self.telemetry_messages(telemetry.device, telemetry))
+        for anomaly in anomaly_objs:
+            messages.extend(self.anomaly_messages(anomaly.device, anomaly))
+        self.broadcast(messages)
+        
+        for anomaly in anomaly_objs:
+            self.logger.info(f"Anomaly detected: {anomaly.description} (severity: {anomaly.severity}) for device {anomaly.device_id}")
+        
+        self.logger.debug(f"Saved {len(telemetry_objs)} telemetry readings")
     
     def process_anomalies(self, device, telemetry, anomalies):
-        """Process anomalies in telemetry data."""
-        for anomaly_data in anomalies:
-            severity = anomaly_data.get('severity', 'medium')
-            description = anomaly_data.get('description', 'Anomaly detected')
-            
-            # Create anomaly record
-            anomaly = AnomalyDetection.objects.create(
+        """Build unsaved anomaly records for the anomalies in telemetry data."""
+        return [
+            AnomalyDetection(
                 device=device,
-                severity=severity,
-                description=description,
+                severity=anomaly_data.get('severity', 'medium'),
+                description=anomaly_data.get('description', 'Anomaly detected'),
                 data=anomaly_data,
                 timestamp=telemetry.timestamp
             )
-            
-            # Broadcast anomaly to WebSocket
-            self.broadcast_anomaly(device, anomaly)
-            
-            self.logger.info(f"Anomaly detected: {description} (severity: {severity}) for device {device.id}")
+            for anomaly_data in anomalies
+        ]
     
-    def broadcast_telemetry(self, device, telemetry):
-        """Broadcast telemetry data to WebSocket channels."""
-        try:
-            # Serialize telemetry for broadcasting
-            telemetry_data = {
-                'id': str(telemetry.id),
-                'device_id': str(device.id),
-                'device_name': device.name,
-                'timestamp': telemetry.timestamp.isoformat(),
-                'data': telemetry.data
-            }
-            
-            # Broadcast to device-specific group
-            async_to_sync(channel_layer.group_send)(
-                f'telemetry_{device.id}',
-                {
-                    'type': 'telemetry_message',
-                    'message': telemetry_data
-                }
-            )
-            
-            # Broadcast to all-telemetry group
-            async_to_sync(channel_layer.group_send)(
-                'telemetry_all',
-                {
-                    'type': 'telemetry_message',
-                    'message': telemetry_data
-                }
-            )
-            
-        except Exception as e:
-            self.logger.error(f"Error broadcasting telemetry: {e}")
+    def broadcast(self, messages):
+        """Send (group, event) pairs to the channel layer without waiting for delivery."""
+        if not messages:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._group_send_all(messages), self._loop)
+        self._broadcasts.add(future)
+        future.add_done_callback(self._broadcasts.discard)
     
-    def broadcast_anomaly(self, device, anomaly):
-        """Broadcast anomaly data to WebSocket channels."""
-        try:
-            # Serialize anomaly for broadcasting
-            anomaly_data = {
-                'id': str(anomaly.id),
-                'device_id': str(device.id),
-                'device_name': device.name,
-                'timestamp': anomaly.timestamp.isoformat(),
-                'severity': anomaly.severity,
-                'description': anomaly.description,
-                'data': anomaly.data
-            }
-            
-            # Broadcast to device-specific group
-            async_to_sync(channel_layer.group_send)(
-                f'telemetry_{device.id}',
-                {
-                    'type': 'anomaly_detected',
-                    'message': anomaly_data
-                }
-            )
-            
-            # Broadcast to all-telemetry group
-            async_to_sync(channel_layer.group_send)(
-                'telemetry_all',
-                {
-                    'type': 'anomaly_detected',
-                    'message': anomaly_data
-                }
-            )
-            
-        except Exception as e:
-            self.logger.error(f"Error broadcasting anomaly: {e}")
+    async def _group_send_all(self, messages):
+        """Send every message concurrently so the channel layer can pipeline them."""
+        results = await asyncio.gather(
+            *(channel_layer.group_send(group, event) for group, event in messages),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            self.logger.error(f"Error broadcasting {len(errors)} of {len(messages)} messages: {errors[0]}")
+    
+    def telemetry_messages(self, device, telemetry):
+        """Channel layer messages broadcasting telemetry data."""
+        # Serialize telemetry for broadcasting; orjson writes the UUID and
+        # datetime in the same form as str() and isoformat()
+        telemetry_data = {
+            'id': str(telemetry.id),
+            'device_id': device.id,
+            'device_name': device.name,
+            'timestamp': telemetry.timestamp,
+            'data': telemetry.data
+        }
+        
+        # Encode the WebSocket frame once here rather than in every consumer
+        event = {
+            'type': 'telemetry_message',
+            'text': orjson.dumps({'type': 'telemetry', 'data': telemetry_data}).decode()
+        }
+        
+        # Broadcast to device-specific group and to all-telemetry group
+        return [(f'telemetry_{device.id}', event), ('telemetry_all', event)]
+    
+    def anomaly_messages(self, device, anomaly):
+        """Channel layer messages broadcasting anomaly data."""
+        # Serialize anomaly for broadcasting
+        anomaly_data = {
+            'id': str(anomaly.id),
+            'device_id': device.id,
+            'device_name': device.name,
+            'timestamp': anomaly.timestamp,
+            'severity': anomaly.severity,
+            'description': anomaly.description,
+            'data': anomaly.data
+        }
+        
+        # Encode the WebSocket frame once here rather than in every consumer
+        event = {
+            'type': 'anomaly_detected',
+            'text': orjson.dumps({'type': 'anomaly', 'data': anomaly_data}).decode()
+        }
+        
+        # Broadcast to device-specific group and to all-telemetry group
+        return [(f'telemetry_{device.id}', event), ('telemetry_all', event)]
 
 
 # Singleton MQTT client instance
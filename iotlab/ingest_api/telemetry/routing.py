@@ -0,0 +1,8 @@
+from django.urls import path
+
+from v1.consumers import TelemetryConsumer
+
+websocket_urlpatterns = [
+    path('ws/telemetry/<uuid:device_id>/', TelemetryConsumer.as_asgi()),
+    path('ws/telemetry/', TelemetryConsumer.as_asgi()),
+]
@@ -0,0 +1,138 @@
+import uuid
+from unittest import mock, skipUnless
+
+import orjson
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from paho.mqtt.client import MQTTMessage
+
+from iotlab.device_simulator.device_types import FlowMeter
+from iotlab.ingest_api.devices.models import Device, DeviceType
+from iotlab.ingest_api.telemetry import mqtt_client
+from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
+
+# Flow Meter schema as seeded by earlier versions of seed_devices, ranges included
+FLOW_METER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "flow_rate": {"type": "number", "minimum": 0, "maximum": 100},
+        "pressure": {"type": "number", "minimum": 0, "maximum": 200},
+        "temperature": {"type": "number", "minimum": 0, "maximum": 150}
+    }
+}
+
+
+def message(device_id, telemetry):
+    msg = MQTTMessage(topic=f"telemetry/{device_id}".encode())
+    msg.payload = orjson.dumps(telemetry)
+    return msg
+
+
+# The telemetry migrations build a BRIN index, which only PostgreSQL has
+@skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class FlushTelemetryTests(TestCase):
+    def setUp(self):
+        mqtt_client._device_cache.clear()
+        mqtt_client._validators.clear()
+        device_type = DeviceType.objects.create(name="Flow Meter", schema=FLOW_METER_SCHEMA)
+        self.device = Device.objects.create(name="Flow-001", device_type=device_type, status="online")
+        self.client = mqtt_client.MQTTClient()
+
+    def ingest(self, readings):
+        for telemetry in readings:
+            self.client.on_message(None, None, message(self.device.id, telemetry))
+        batch = []
+        for buffer, _ in self.client._shards:
+            batch.extend(buffer)
+            buffer.clear()
+        with mock.patch.object(self.client, "broadcast"):
+            self.client.flush_telemetry(batch)
+
+    def test_generator_output_is_stored(self):
+        # A high target flow rate puts most readings above the schema's maximum
+        meter = FlowMeter(device_id=str(self.device.id), config={"failure_rate": 0})
+        meter.target_flow_rate = 100
+        readings = [meter.generate_telemetry() for _ in range(50)]
+
+        anomalous = meter.generate_telemetry()
+        anomalous["data"]["flow_rate"] = 250.0
+        anomalous["anomalies"] = meter.detect_anomalies(anomalous["data"])
+        self.assertTrue(anomalous["anomalies"])
+        readings.append(anomalous)
+
+        self.ingest(readings)
+
+        self.assertEqual(Telemetry.objects.filter(device=self.device).count(), len(readings))
+        expected_anomalies = sum(len(telemetry.get("anomalies", [])) for telemetry in readings)
+        self.assertEqual(AnomalyDetection.objects.filter(device=self.device).count(), expected_anomalies)
+        self.assertTrue(Telemetry.objects.filter(device=self.device, data__flow_rate=250.0).exists())
+
+    def test_wrong_types_are_dropped(self):
+        meter = FlowMeter(device_id=str(self.device.id), config={"failure_rate": 0})
+        bad = meter.generate_telemetry()
+        bad["data"]["flow_rate"] = "fast"
+
+        self.ingest([meter.generate_telemetry(), bad])
+
+        self.assertEqual(Telemetry.objects.filter(device=self.device).count(), 1)
+
+    def test_bad_anomalies_only_drop_their_message(self):
+        meter = FlowMeter(device_id=str(self.device.id), config={"failure_rate": 0})
+        anomalous = meter.generate_telemetry()
+        anomalous["anomalies"] = [{"severity": "high", "description": "Flow rate too high"}]
+        bad = [meter.generate_telemetry() for _ in range(3)]
+        bad[0]["anomalies"] = ["flow too high"]
+        bad[1]["anomalies"] = {"severity": "high"}
+        bad[2]["anomalies"] = [{"severity": "catastrophic" * 5}]
+
+        self.ingest([meter.generate_telemetry(), *bad, anomalous])
+
+        self.assertEqual(Telemetry.objects.filter(device=self.device).count(), 2)
+        self.assertEqual(AnomalyDetection.objects.filter(device=self.device).count(), 1)
+
+
+class ShardTests(SimpleTestCase):
+    @override_settings(MQTT_FLUSH_WORKERS=4)
+    def test_each_device_keeps_to_one_shard_in_order(self):
+        client = mqtt_client.MQTTClient()
+        device_ids = [str(uuid.uuid4()) for _ in range(8)]
+        for i in range(5):
+            for device_id in device_ids:
+                client.process_telemetry(device_id, {"data": {"sequence": i}})
+
+        for device_id in device_ids:
+            sequences = [
+                [payload["data"]["sequence"] for queued_id, _, payload in buffer if str(queued_id) == device_id]
+                for buffer, _ in client._shards
+            ]
+            self.assertEqual([sequence for sequence in sequences if sequence], [list(range(5))])
+
+
+# Worker processes open their own connections, so they can't see rows in an
+# uncommitted TestCase transaction or an in-memory sqlite database
+@skipUnless(connection.vendor == "postgresql", "needs a database other processes can share")
+class GenerateTelemetryTests(TransactionTestCase):
+    def setUp(self):
+        for name in ("Temperature Sensor", "Vibration Sensor", "Flow Meter"):
+            device_type = DeviceType.objects.create(name=name, schema={})
+            for i in range(2):
+                Device.objects.create(name=f"{name} {i}", device_type=device_type, status="online")
+
+    def generate(self, workers):
+        call_command("generate_telemetry", days=1, readings_per_day=48, seed=42, workers=workers, stdout=mock.Mock())
+        # Timestamps follow the current time, so compare readings in order rather than by time
+        telemetry = list(Telemetry.objects.order_by("device_id", "timestamp").values_list("device_id", "data"))
+        anomalies = list(
+            AnomalyDetection.objects.order_by("device_id", "timestamp")
+            .values_list("device_id", "severity", "description", "data")
+        )
+        Telemetry.objects.all().delete()
+        AnomalyDetection.objects.all().delete()
+        return telemetry, anomalies
+
+    def test_seeded_output_does_not_depend_on_workers(self):
+        telemetry, anomalies = self.generate(workers=1)
+        self.assertEqual(len(telemetry), 6 * 49)
+        self.assertTrue(anomalies)
+        self.assertEqual(self.generate(workers=3), (telemetry, anomalies))
@@ -1,12 +1,26 @@
-import json
+import time
+import asyncio
+import orjson
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.serializers.json import DjangoJSONEncoder
 
 from iotlab.ingest_api.devices.models import Device
 
+# Device IDs recently confirmed to exist: device_id -> expiry. Only hits are
+# cached so a newly created device can be subscribed to straight away.
+DEVICE_EXISTS_TTL = 60
+_known_devices = {}
+
 
 class TelemetryConsumer(AsyncJsonWebsocketConsumer):
+    @classmethod
+    async def decode_json(cls, text_data):
+        return orjson.loads(text_data)
+    
+    @classmethod
+    async def encode_json(cls, content):
+        return orjson.dumps(content).decode()
+    
     async def connect(self):
         # Get the device_id from the URL rout
         self.device_id = self.scope['url_route']['kwargs'].get('device_id')
@@ -20,17 +34,16 @@ class TelemetryConsumer(AsyncJsonWebsocketConsumer):
                 return
                 
             # Join device-specific group
-            self.groups = [f'telemetry_{self.device_id}']
+            self.groups = {f'telemetry_{self.device_id}'}
         else:
             # Join the "all telemetry" group
-            self.groups = ['telemetry_all']
+            self.groups = {'telemetry_all'}
         
         # Add this channel to all the groups
-        for group in self.groups:
-            await self.channel_layer.group_add(
-                group,
-                self.channel_name
-            )
+        await asyncio.gather(*(
+            self.channel_layer.group_add(group, self.channel_name)
+            for group in self.groups
+        ))
         
         await self.accept()
         await self.send_json({
@@ -40,11 +53,10 @@ class TelemetryConsumer(AsyncJsonWebsocketConsumer):
     
     async def disconnect(self, close_code):
         # Leave all the groups
-        for group in self.groups:
-            await self.channel_layer.group_discard(
-                group,
-                self.channel_name
-            )
+        await asyncio.gather(*(
+            self.channel_layer.group_discard(group, self.channel_name)
+            for group in self.groups
+        ))
     
     async def receive_json(self, content):
         # Client can send commands to alter the subscription
@@ -55,7 +67,7 @@ class TelemetryConsumer(AsyncJsonWebsocketConsumer):
             if device_id and await self.device_exists(device_id):
                 group_name = f'telemetry_{device_id}'
                 if group_name not in self.groups:
-                    self.groups.append(group_name)
+                    self.groups.add(group_name)
                     await self.channel_layer.group_add(
                         group_name,
                         self.channel_name
@@ -69,7 +81,7 @@ class TelemetryConsumer(AsyncJsonWebsocketConsumer):
             device_id = content.get('device_id')
             group_name = f'telemetry_{device_id}'
             if group_name in self.groups:
-                self.groups.remove(group_name)
+                self.groups.discard(group_name)
                 await self.channel_layer.group_discard(
                     group_name,
                     self.channel_name
@@ -81,21 +93,24 @@ class TelemetryConsumer(AsyncJsonWebsocketConsumer):
     
     # Handler for messages sent to the group
     async def telemetry_message(self, event):
-        # Forward the message to the WebSocket
-        message = event['message']
-        await self.send_json({
-            'type': 'telemetry',
-            'data': message
-        })
+        # Forward the already-encoded message to the WebSocket
+        await self.send(text_data=event['text'])
     
     async def anomaly_detected(self, event):
-        # Forward anomaly events to the WebSocket
-        message = event['message']
-        await self.send_json({
-            'type': 'anomaly',
-            'data': message
-        })
+        # Forward the already-encoded anomaly event to the WebSocket
+        await self.send(text_data=event['text'])
+    
+    async def device_exists(self, device_id):
+        key = str(device_id)
+        now = time.monotonic()
+        if _known_devices.get(key, 0) > now:
+            return True
+        
+        exists = await self._device_exists(device_id)
+        if exists:
+            _known_devices[key] = now + DEVICE_EXISTS_TTL
+        return exists
     
     @database_sync_to_async
-    def device_exists(self, device_id):
+    def _device_exists(self, device_id):
         return Device.objects.filter(id=device_id).exists() 
\ No newline at end of file
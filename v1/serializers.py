@@ -1,16 +1,33 @@
+import copy
+
 from rest_framework import serializers
 from iotlab.ingest_api.devices.models import DeviceType, Device, DeviceConfig
 from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
 
+# Serializer class -> the unbound fields its get_fields() built
+_field_cache = {}
+
+
+class CachedFieldsMixin:
+    """
+    Introspect the model once per serializer class and give every instance
+    a copy of the fields, the same way DRF copies declared fields.
+    """
+    def get_fields(self):
+        fields = _field_cache.get(type(self))
+        if fields is None:
+            fields = _field_cache[type(self)] = super().get_fields()
+        return copy.deepcopy(fields)
+
 
-class DeviceTypeSerializer(serializers.ModelSerializer):
+class DeviceTypeSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = DeviceType
         fields = ['id', 'name', 'description', 'schema', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
 
-class DeviceConfigSerializer(serializers.ModelSerializer):
+class DeviceConfigSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = DeviceConfig
         fields = ['id', 'config', 'publishing_interval', 'failure_rate', 
@@ -18,7 +35,7 @@ class DeviceConfigSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class DeviceSerializer(serializers.ModelSerializer):
+class DeviceSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     device_type = DeviceTypeSerializer(read_only=True)
     device_type_id = serializers.PrimaryKeyRelatedField(
         write_only=True, 
@@ -35,7 +52,7 @@ class DeviceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'last_seen', 'created_at', 'updated_at']
 
 
-class TelemetrySerializer(serializers.ModelSerializer):
+class TelemetrySerializer(CachedFieldsMixin, serializers.ModelSerializer):
     device_id = serializers.UUIDField(source='device.id', read_only=True)
     device_name = serializers.CharField(source='device.name', read_only=True)
     
@@ -45,7 +62,7 @@ class TelemetrySerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         
 
-class AnomalyDetectionSerializer(serializers.ModelSerializer):
+class AnomalyDetectionSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     device_id = serializers.UUIDField(source='device.id', read_only=True)
     device_name = serializers.CharField(source='device.name', read_only=True)
     
@@ -1,9 +1,16 @@
+import hashlib
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, Max
+from django.db.models.fields.json import KeyTransform
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 
+from iotlab.ingest_api.core.utils import bounded_int
 from iotlab.ingest_api.devices.models import DeviceType, Device, DeviceConfig
 from iotlab.ingest_api.telemetry.models import Telemetry, AnomalyDetection
 from .serializers import (
@@ -11,6 +18,38 @@ from .serializers import (
     TelemetrySerializer, AnomalyDetectionSerializer
 )
 
+# Upper bound on the ?limit= of the per-device telemetry and anomaly actions
+MAX_LIMIT = 1000
+
+# TelemetrySerializer field -> column TelemetryViewSet.list reads it from
+TELEMETRY_COLUMNS = {
+    'id': 'id',
+    'device': 'device_id',
+    'device_id': 'device_id',
+    'device_name': 'device__name',
+    'timestamp': 'timestamp',
+    'data': 'data',
+}
+
+
+
+def device_list_etag(request, *args, **kwargs):
+    """
+    Weak ETag for the device list, which changes whenever a device, its type
+    or its config is added, edited or removed, or a device reports in.
+    """
+    stats = Device.objects.aggregate(
+        count=Count('id'),
+        updated=Max('updated_at'),
+        last_seen=Max('last_seen'),
+        type_updated=Max('device_type__updated_at'),
+        config_updated=Max('config__updated_at'),
+        # Removing a config other than the newest leaves the Max unchanged
+        configs=Count('config'),
+    )
+    digest = hashlib.md5(repr(sorted(stats.items())).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
 
 class DeviceTypeViewSet(viewsets.ModelViewSet):
     queryset = DeviceType.objects.all()
@@ -23,7 +62,7 @@ class DeviceTypeViewSet(viewsets.ModelViewSet):
 
 
 class DeviceViewSet(viewsets.ModelViewSet):
-    queryset = Device.objects.all()
+    queryset = Device.objects.select_related('device_type', 'config')
     serializer_class = DeviceSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['device_type', 'status', 'location']
@@ -31,6 +70,11 @@ class DeviceViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'status', 'last_seen', 'created_at']
     ordering = ['name']
     
+    @method_decorator(etag(device_list_etag))
+    def list(self, request, *args, **kwargs):
+        # Pollers that already hold the current list get a 304 without it being rebuilt
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def update_config(self, request, pk=None):
         device = self.get_object()
@@ -52,17 +96,18 @@ class DeviceViewSet(viewsets.ModelViewSet):
         # Get query parameters for time filtering
         start_time = request.query_params.get('start_time')
         end_time = request.query_params.get('end_time')
-        limit = request.query_params.get('limit', 100)
+        limit = bounded_int(request.query_params.get('limit'), 100, 1, MAX_LIMIT)
         
-        # Build the queryset with filters
-        queryset = device.telemetry.all()
+        # Build the queryset with filters; the serializer reads device.name,
+        # so join it rather than fetching it per row
+        queryset = Telemetry.objects.filter(device=device).select_related('device')
         if start_time:
             queryset = queryset.filter(timestamp__gte=start_time)
         if end_time:
             queryset = queryset.filter(timestamp__lte=end_time)
             
         # Apply limit and order
-        queryset = queryset.order_by('-timestamp')[:int(limit)]
+        queryset = queryset.order_by('-timestamp')[:limit]
         
         serializer = TelemetrySerializer(queryset, many=True)
         return Response(serializer.data)
@@ -74,30 +119,65 @@ class DeviceViewSet(viewsets.ModelViewSet):
         # Get query parameters
         acknowledged = request.query_params.get('acknowledged')
         severity = request.query_params.get('severity')
-        limit = request.query_params.get('limit', 50)
+        limit = bounded_int(request.query_params.get('limit'), 50, 1, MAX_LIMIT)
         
         # Build the queryset with filters
-        queryset = device.anomalies.all()
+        queryset = AnomalyDetection.objects.filter(device=device).select_related('device')
         if acknowledged is not None:
             queryset = queryset.filter(acknowledged=(acknowledged.lower() == 'true'))
         if severity:
             queryset = queryset.filter(severity=severity)
             
         # Apply limit and order
-        queryset = queryset.order_by('-timestamp')[:int(limit)]
+        queryset = queryset.order_by('-timestamp')[:limit]
         
         serializer = AnomalyDetectionSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
 class TelemetryViewSet(viewsets.ModelViewSet):
-    queryset = Telemetry.objects.all()
+    queryset = Telemetry.objects.select_related('device')
     serializer_class = TelemetrySerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['device']
     ordering_fields = ['timestamp']
     ordering = ['-timestamp']
     
+    def list(self, request, *args, **kwargs):
+        # Read-only hot path: build the same rows TelemetrySerializer would,
+        # straight from the database, without instantiating models or fields.
+        # ?fields=timestamp,data.temperature narrows the columns and data keys.
+        fields, data_keys = self.requested_fields(request.query_params.get('fields'))
+        key_columns = {f'data_{i}': KeyTransform(key, 'data') for i, key in enumerate(data_keys)}
+        queryset = self.filter_queryset(self.get_queryset()).annotate(**key_columns).values_list(
+            *(TELEMETRY_COLUMNS[field] for field in fields), *key_columns
+        )
+        page = self.paginate_queryset(queryset)
+        rows = []
+        for row in (queryset if page is None else page):
+            item = dict(zip(fields, row))
+            if data_keys:
+                item['data'] = dict(zip(data_keys, row[len(fields):]))
+            rows.append(item)
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+    
+    def requested_fields(self, param):
+        """
+        Split ?fields= into the TELEMETRY_COLUMNS to return (in serializer
+        order) and the keys to pick out of data. Unknown names are ignored;
+        with none left, every field is returned.
+        """
+        names = {name.strip() for name in (param or '').split(',')}
+        data_keys = [] if 'data' in names else sorted(
+            name[5:] for name in names if name.startswith('data.') and len(name) > 5
+        )
+        fields = [field for field in TELEMETRY_COLUMNS if field in names]
+        if not fields and not data_keys:
+            return list(TELEMETRY_COLUMNS), []
+        return fields, data_keys
+    
     def perform_create(self, serializer):
         # Update the device's last_seen timestamp
         device = serializer.validated_data.get('device')
@@ -109,7 +189,7 @@ class TelemetryViewSet(viewsets.ModelViewSet):
 
 
 class AnomalyDetectionViewSet(viewsets.ModelViewSet):
-    queryset = AnomalyDetection.objects.all()
+    queryset = AnomalyDetection.objects.select_related('device')
     serializer_class = AnomalyDetectionSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['device', 'severity', 'acknowledged']